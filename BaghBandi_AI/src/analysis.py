@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from engines import ENGINES, ENGINE_OPTIONS, create_engine, engine_stats, load_config
+from rules import CELLS
+from transposition import SharedTable
+
+# Engine of the current worker process, created once by init_worker and kept warm for the whole batch
+_worker = {}
+
+
+def init_worker(engine_name, engine_options, table_handle=None):
+    """ Create the engine of a worker process once, so its caches carry over from position to position.
+    Engines with a transposition table attach to the one shared by the whole pool. """
+    # The engines print while they search; keep the output stream clean
+    sys.stdout = open(os.devnull, "w")
+    _worker["engine"] = create_engine(engine_name, **engine_options)
+    if table_handle is not None and hasattr(_worker["engine"], "shared_table"):
+        _worker["engine"].shared_table = SharedTable.attach(table_handle)
+
+
+def analyse_position(index, position):
+    """ Search one position in a worker process and return its result record """
+    engine = _worker["engine"]
+    tigers = [tuple(cell) for cell in position["tigers"]]
+    goats = [tuple(cell) for cell in position.get("goats", [])]
+    empty_positions = [cell for cell in CELLS if cell not in tigers and cell not in goats]
+    start = time.perf_counter()
+    move = engine.determine_goat_move(tigers, goats, empty_positions, int(position["remaining_goat_number"]))
+    stats = dict(getattr(engine, "last_search_stats", None) or {})
+    prover = getattr(engine, "prover", None)
+    return dict({
+        "index": index,
+        "id": position.get("id"),
+        "move": move,
+        "score": stats.pop("score", None),
+        "stats": stats,
+        "proof": prover.last_stats.get("result") if prover is not None else None,
+        "elapsed": time.perf_counter() - start,
+        "worker": os.getpid(),
+    }, **engine_stats(engine))
+
+
+def analyse(positions, engine="monte_carlo", workers=None, engine_options=None, max_pending=None):
+    """ Analyse a stream of positions over a process pool and yield one result record per position,
+    in the order the searches finish. Positions are dicts as sent to the move server ("tigers", "goats",
+    "remaining_goat_number" and an optional "id"); records carry the input "index" and "id", the best "move",
+    its "score" for the goats, the engine's search "stats", the outcome of the forced-trap "proof", the
+    search time, and the "worker" process with the counters of its "caches" so far (and of its "move_cache" and
+    "table", if it uses them). At most max_pending positions are read ahead of the results, so memory stays the same
+    however long the stream is. With a "table_size" engine option all workers share one transposition table. """
+    workers = workers or os.cpu_count()
+    max_pending = max_pending or 2 * workers
+    engine_options = engine_options or {}
+    positions = iter(positions)
+    pending = set()
+    table = SharedTable(engine_options["table_size"]) if engine_options.get("table_size") else None
+    try:
+        with ProcessPoolExecutor(workers, initializer=init_worker,
+                                 initargs=(engine, engine_options, table and table.handle())) as executor:
+            index = 0
+            exhausted = False
+            while pending or not exhausted:
+                # Keep the pool busy without reading the stream further ahead than needed
+                while not exhausted and len(pending) < max_pending:
+                    position = next(positions, None)
+                    if position is None:
+                        exhausted = True
+                        break
+                    pending.add(executor.submit(analyse_position, index, position))
+                    index += 1
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+    finally:
+        if table is not None:
+            table.close()
+
+
+def read_positions(lines):
+    """ Positions of a JSON lines stream, skipping blank lines """
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse logged positions (JSON lines) and print the results "
+                                                 "as JSON lines")
+    parser.add_argument("input", nargs="?", help="JSON lines file of positions; standard input if omitted")
+    parser.add_argument("--engine", type=str.lower, default="monte_carlo", choices=ENGINES, help="Goat engine")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes, one search each")
+    parser.add_argument("--iterations", type=int, help="Search iterations per position")
+    parser.add_argument("--time-limit", type=float, help="Search time per position in seconds")
+    parser.add_argument("--cache-size", type=int, help="Entries kept in the engine caches")
+    parser.add_argument("--max-nodes", type=int, help="Node budget of the search tree")
+    parser.add_argument("--table-size", type=int, help="Entries of the transposition table shared by the workers")
+    parser.add_argument("--proof-nodes", type=int,
+                        help="Node budget of the forced-trap proof (5000 for monte_carlo and beam); 0 turns it off")
+    parser.add_argument("--move-cache", help="Persistent move cache file (sqlite), shared across games and runs")
+    parser.add_argument("--seed", type=int, help="Random seed of every worker's engine")
+    parser.add_argument("--config", help="JSON file with engine options")
+    args = parser.parse_args()
+    engine_options = load_config(args.config) if args.config else {}
+    for option in ENGINE_OPTIONS:
+        # The workers flag sets the pool; each position is searched in a single process
+        if option != "workers" and getattr(args, option) is not None:
+            engine_options[option] = getattr(args, option)
+    lines = open(args.input) if args.input else sys.stdin
+    try:
+        for result in analyse(read_positions(lines), args.engine, args.workers, engine_options):
+            print(json.dumps(result), flush=True)
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,7 @@
-import random
 import heapq
-import random
 from constants import *
 from constants import BOARD_SIZE
+from rng import make_rng
 
 
 class ASTAR:
@@ -10,8 +9,9 @@ class ASTAR:
     #         new_goat_position = random.choice(empty_positions)
     #         return new_goat_position
 
-    def __init__(self, board):
+    def __init__(self, board, seed=None):
         self.board = board
+        self.rng = make_rng(seed)
 
     def is_adjacent_to_tiger(self, position, tigers):
         """ Check if a position is adjacent to any tiger """
@@ -39,7 +39,7 @@ class ASTAR:
         # checks to see if goat is empty at first and picks a random position from the optimal ones at first
         if goats == []:
             empty_position_to_pick = [(0, 2), (2, 0), (2, 2), (4, 2), (2, 4)]
-            a = random.choice(empty_position_to_pick)
+            a = self.rng.choice(empty_position_to_pick)
             return (None, a)
         else:
 
@@ -0,0 +1,134 @@
+import time
+
+from monte_carlo import State as SearchState, WIN_SCORE
+
+# Children scored between two looks at the deadline when an evaluator scores them in batches; without one,
+# positions are scored one by one anyway, and the deadline is looked at after every child
+CHILD_BATCH = 16
+
+
+class BeamSearch:
+    # Level-by-level lookahead with a bounded frontier. A level is one goat move and the tigers' best reply to
+    # it: every state of the beam is expanded with its goat moves, every resulting position with all tiger
+    # replies, and a goat move is worth the score of the reply that is worst for the goats. Only the
+    # beam_width best positions of a level are expanded further, so a search holds at most beam_width times the
+    # branching factor positions per level, whatever its depth. Positions are scored by the evaluator when
+    # there is one (see MonteCarlo), in batches of CHILD_BATCH children, and by State.get_result otherwise.
+    # Positions reached along several lines are expanded once. The search stops after depth levels, or once
+    # time_limit has passed, between two batches, and plays the first move of the best position of the last
+    # complete level (of the children scored so far, if the first level is cut short).
+    def __init__(self, board, beam_width=8, depth=3, time_limit=None, evaluator=None):
+        self.board = board
+        self.beam_width = beam_width
+        self.depth = depth
+        self.time_limit = time_limit
+        if isinstance(evaluator, str):
+            from value_net import ValueNet
+            evaluator = ValueNet.load(evaluator)
+        self.evaluator = evaluator
+        self.child_batch = 1 if evaluator is None else CHILD_BATCH
+        # Score of a finished game won by the goats
+        self.win_score = 1 if evaluator is not None else WIN_SCORE
+        # Number of beam positions per first move at the last level, and the counters of the last search
+        self.last_root_visits = []
+        self.last_search_stats = {}
+
+    def evaluate(self, states):
+        """ Scores of a batch of positions for the goats """
+        if self.evaluator is not None:
+            return [float(value) for value in self.evaluator.evaluate_states(states)]
+        return [state.get_result() for state in states]
+
+    def expand(self, beam, deadline=None):
+        """ Next level of the beam: (score, first move, state, finished) of every goat move of every unfinished
+        beam state, each followed by the tigers' best reply. Also returns the number of positions scored and
+        whether the level is complete: past the deadline it stops after the batch of children in progress. """
+        children = {}
+        carried = []
+        for entry in beam:
+            if deadline is not None and children and time.perf_counter() > deadline:
+                return carried, 0, False
+            _, first_move, state, finished = entry
+            if finished:
+                carried.append(entry)
+                continue
+            for move in state.get_legal_moves():
+                child = state.clone()
+                child.do_move(move)
+                children.setdefault(child.history_key(), (first_move or move, child))
+
+        level = carried
+        expanded = 0
+        children = list(children.values())
+        for batch_start in range(0, len(children), self.child_batch):
+            if deadline is not None and batch_start and time.perf_counter() > deadline:
+                return level, expanded, False
+            # Every tiger reply of the batch's children, scored at once. Finished positions get their exact score.
+            owners = []
+            replies = []
+            scores = []
+            finished = []
+            batch = children[batch_start:batch_start + self.child_batch]
+            for index, (_, child) in enumerate(batch):
+                tiger_replies = child.get_moves() if child.proven_result() is None else []
+                if not tiger_replies:
+                    tiger_replies = [None]
+                for tiger_move in tiger_replies:
+                    reply = child
+                    if tiger_move is not None:
+                        reply = child.clone()
+                        reply.do_move(tiger_move)
+                    owners.append(index)
+                    replies.append(reply)
+                    proven = reply.proven_result()
+                    scores.append(None if proven is None else proven * self.win_score)
+                    finished.append(proven is not None)
+            pending = [i for i, score in enumerate(scores) if score is None]
+            for i, value in zip(pending, self.evaluate([replies[i] for i in pending])):
+                scores[i] = value
+            expanded += len(replies)
+
+            # The tigers pick the reply that is worst for the goats
+            worst = {}
+            for index, reply, score, reply_finished in zip(owners, replies, scores, finished):
+                if index not in worst or score < worst[index][0]:
+                    worst[index] = (score, reply, reply_finished)
+            for index, (first_move, _) in enumerate(batch):
+                score, reply, reply_finished = worst[index]
+                level.append((score, first_move, reply, reply_finished))
+        return level, expanded, True
+
+    def determine_goat_move(self, tigers, goats, empty_positions, remaining_goat_number):
+        start = time.perf_counter()
+        deadline = None if self.time_limit is None else start + self.time_limit
+        root = SearchState(list(tigers), list(goats), list(empty_positions), remaining_goat_number)
+        beam = [(0, None, root, False)]
+        nodes = 0
+        depth = 0
+        peak = 0
+        while depth < self.depth:
+            level, expanded, complete = self.expand(beam, deadline)
+            nodes += expanded
+            peak = max(peak, expanded)
+            # A level cut short by the deadline only replaces the beam at the first level, which has no
+            # better moves to fall back on
+            if not level or not complete and depth > 0:
+                break
+            depth += 1
+            level.sort(key=lambda entry: entry[0], reverse=True)
+            beam = level[:self.beam_width]
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+
+        elapsed = time.perf_counter() - start
+        self.last_search_stats = {"iterations": depth, "nodes": nodes, "max_depth": depth, "elapsed": elapsed,
+                                  "nodes_per_second": nodes / elapsed if elapsed else 0.0, "tree_size": peak}
+        if beam[0][1] is None:
+            self.last_root_visits = []
+            return None
+        counts = {}
+        for _, first_move, _, _ in beam:
+            counts[first_move] = counts.get(first_move, 0) + 1
+        self.last_root_visits = list(counts.items())
+        self.last_search_stats["score"] = beam[0][0]
+        return beam[0][1]
@@ -1,6 +1,6 @@
 import math
 
-from constants import BOARD_SIZE
+from constants import BOARD_SIZE, EXPLORATION_CONSTANT
 
 nodes_in_order_of_search = [
     (0, 0),  # 1
@@ -70,9 +70,10 @@ class Node:
         self.state = state
         self.untried_moves = state.get_legal_moves()
 
-    def select_child(self):
+    def select_child(self, exploration_constant=EXPLORATION_CONSTANT):
         """Select a child node with the highest UCB1 value."""
-        return max(self.children, key=lambda c: (c.wins / c.visits) + math.sqrt(2 * math.log(self.visits) / c.visits))
+        return max(self.children, key=lambda c: (c.wins / c.visits) + math.sqrt(
+            exploration_constant * math.log(self.visits) / c.visits))
 
     def add_child(self, move, state):
         """Add a new child node for the given move."""
@@ -162,6 +163,8 @@ class State:
                 legal_moves.append((None, empty))  # None signifies placement of a new goat
 
         # Movement moves
+        safe_moves = []
+        risky_moves = []
         for goat in self.goats:
             allowed_directions = normal_directions if goat in restricted_positions else normal_directions + diagonal_directions
             for dx, dy in allowed_directions:
@@ -169,10 +172,10 @@ class State:
                 if 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE and (nx, ny) not in self.tigers and (
                         nx, ny) not in self.goats:
                     if not self.is_adjacent_to_tiger((nx, ny)):
-                        legal_moves.insert(0, (goat, (nx, ny)))  # Prioritize safer moves
+                        safe_moves.append((goat, (nx, ny)))  # Prioritize safer moves
                     else:
-                        legal_moves.append((goat, (nx, ny)))  # Add risky moves if necessary
-        return legal_moves
+                        risky_moves.append((goat, (nx, ny)))  # Add risky moves if necessary
+        return safe_moves[::-1] + legal_moves + risky_moves
 
     def do_move(self, move):
         """ Update the state by performing a move """
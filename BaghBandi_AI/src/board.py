@@ -15,6 +15,35 @@ class Board:
         self.draw_text(f"Moves: {number_of_moves}", (MARGIN + 370, info_y_position))
         self.draw_text(f"Result: {message}", (MARGIN + 470, info_y_position))
 
+    # Draw the statistics of the engine's last search below the board and a heatmap of the root visits
+    # over the target squares of the candidate moves
+    def draw_telemetry(self, stats, root_visits):
+        info_y_position = SCREEN_SIZE + MARGIN + 60
+        if not stats:
+            self.draw_text("No search statistics for this engine", (MARGIN - 50, info_y_position))
+            return
+        self.draw_text(f"Nodes/s: {stats['nodes_per_second']:,.0f}", (MARGIN - 50, info_y_position))
+        self.draw_text(f"Iterations: {stats['iterations']}", (MARGIN + 170, info_y_position))
+        self.draw_text(f"Time: {stats['elapsed']:.2f}s", (MARGIN + 370, info_y_position))
+        self.draw_text(f"Depth: {stats['max_depth']}", (MARGIN + 470, info_y_position))
+        self.draw_text(f"Tree: {stats['tree_size']} nodes", (MARGIN + 570, info_y_position))
+
+        square_visits = {}
+        for (_, target), visits in root_visits:
+            square_visits[target] = square_visits.get(target, 0) + visits
+        total_visits = sum(square_visits.values())
+        if not total_visits:
+            return
+        most_visits = max(square_visits.values())
+        for (row, col), visits in square_visits.items():
+            # The more visits, the larger and the more saturated the disc
+            share = visits / most_visits
+            color = tuple(round(255 - (255 - channel) * share) for channel in HEATMAP_COLOR)
+            center = (col * CELL_SIZE + MARGIN, row * CELL_SIZE + MARGIN)
+            pygame.draw.circle(self.screen, color, center, round(CELL_SIZE // 10 + CELL_SIZE // 8 * share), 3)
+            self.draw_text(f"{visits / total_visits:.0%}", (center[0] + CELL_SIZE // 6, center[1] - CELL_SIZE // 6),
+                           font_size=20)
+
     # Styling the text of the board
     def draw_text(self, text, position, font_size=25, color=(61, 52, 235)):
         font = pygame.font.Font(None, font_size)
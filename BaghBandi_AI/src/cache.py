@@ -0,0 +1,72 @@
+from collections import OrderedDict
+
+# Default number of entries of every shared cache
+DEFAULT_CACHE_SIZE = 100000
+
+
+class LRUCache:
+    # Bounded memoization table: once max_entries is reached the least recently used entry is evicted.
+    # Hits and misses are counted, so the cache can be sized from its hit rate.
+    def __init__(self, name, max_entries=DEFAULT_CACHE_SIZE):
+        self.name = name
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        value = self.entries.get(key, default)
+        if value is default:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, max_entries):
+        self.max_entries = max_entries
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"name": self.name, "entries": len(self.entries), "max_entries": self.max_entries,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+# Caches shared by every engine of this process, by name. They outlive single searches,
+# so positions repeated across iterations and across the moves of a game are computed once.
+_caches = {}
+
+
+def get_cache(name):
+    """ The shared cache with the given name, created on first use """
+    if name not in _caches:
+        _caches[name] = LRUCache(name)
+    return _caches[name]
+
+
+def set_cache_size(max_entries):
+    """ Set the size of every shared cache, also of those created later """
+    global DEFAULT_CACHE_SIZE
+    DEFAULT_CACHE_SIZE = max_entries
+    for cache in _caches.values():
+        cache.resize(max_entries)
+
+
+def cache_stats():
+    """ Counters of every shared cache """
+    return [cache.stats() for cache in _caches.values()]
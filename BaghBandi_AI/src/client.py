@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from rules import CELLS
+
+
+def random_position(rng):
+    """ A random position: four tigers and up to 20 goats on distinct cells """
+    cells = rng.sample(CELLS, 24)
+    goats = cells[4:4 + rng.randint(0, 20)]
+    remaining = rng.randint(max(len(goats), 6), 25)
+    return {"tigers": [list(cell) for cell in cells[:4]], "goats": [list(cell) for cell in goats],
+            "remaining_goat_number": remaining}
+
+
+async def request_move(reader, writer, request):
+    """ Send one move request on an open connection and return (HTTP status, response) """
+    body = json.dumps(request).encode()
+    writer.write(f"POST /move HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = (await reader.readline()).decode("latin-1").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def run_session(host, port, session, requests, engine, time_limit, rng, latencies, statuses):
+    """ One simulated game session: a connection sending requests one after the other """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(requests):
+            request = dict(random_position(rng), engine=engine, time_limit=time_limit, session=session)
+            start = time.perf_counter()
+            status, _ = await request_move(reader, writer, request)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def load_test(host, port, sessions, requests, engine, time_limit, seed):
+    rng = random.Random(seed)
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(host, port, f"session-{i}", requests, engine, time_limit, rng, latencies,
+                                       statuses) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"{len(latencies)} requests in {elapsed:.1f}s: {len(latencies) / elapsed:.1f} requests/s")
+    print(f"status codes: {statuses}")
+    if latencies:
+        print(f"latency: mean {statistics.mean(latencies):.3f}s, p50 {latencies[len(latencies) // 2]:.3f}s, "
+              f"p95 {latencies[int(len(latencies) * 0.95)]:.3f}s, max {latencies[-1]:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the goat move server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--sessions", type=int, default=16, help="Concurrent game sessions")
+    parser.add_argument("--requests", type=int, default=10, help="Requests per session")
+    parser.add_argument("--engine", default="monte_carlo")
+    parser.add_argument("--time-limit", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(load_test(args.host, args.port, args.sessions, args.requests, args.engine, args.time_limit,
+                          args.seed))
+
+
+if __name__ == '__main__':
+    main()
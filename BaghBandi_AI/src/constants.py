@@ -7,4 +7,9 @@ LINE_COLOR = (0, 0, 0)
 GOAT_COLOR = (255, 0, 0)
 TIGER_COLOR = (0, 128, 0)
 BACKGROUND_COLOR = (255, 255, 255)
-WINDOW_SIZE = (SCREEN_SIZE + 2 * MARGIN, SCREEN_SIZE + 2 * MARGIN)
\ No newline at end of file
+HEATMAP_COLOR = (255, 140, 0)
+WINDOW_SIZE = (SCREEN_SIZE + 2 * MARGIN, SCREEN_SIZE + 2 * MARGIN)
+# Tigers win once the number of remaining goats drops to this value
+TIGER_WIN_GOAT_COUNT = 5
+# UCB1 exploration constant of the tree searches, tuned by tuning.py
+EXPLORATION_CONSTANT = 1.5
@@ -0,0 +1,78 @@
+import importlib
+import inspect
+import json
+
+from cache import cache_stats
+
+# Registered goat engines: name -> (module, class).
+# Engine modules are only imported when an engine is created, so a game only loads the engine it plays with.
+ENGINES = {
+    "random": ("random_play", "Random_Play"),
+    "bfs": ("bfs", "BFS"),
+    "dfs": ("dfs", "DFS"),
+    "astar": ("astar", "ASTAR"),
+    "monte_carlo": ("monte_carlo", "MonteCarlo"),
+    "beam": ("beam", "BeamSearch"),
+}
+
+# Engine tunables that can be set from the command line. A config file may also set any other
+# constructor argument, e.g. "rave_constant". Every engine only receives the options its constructor accepts.
+ENGINE_OPTIONS = ["iterations", "time_limit", "workers", "cache_size", "max_nodes", "table_size", "proof_nodes",
+                  "move_cache", "seed"]
+
+# Node budget of the forced-trap proof the search engines try first in movement-phase positions; 0 turns it off.
+# The baseline engines play without it unless a budget is given.
+DEFAULT_PROOF_NODES = 5000
+PROOF_ENGINES = {"monte_carlo", "beam"}
+
+
+def load_engine_class(name):
+    """ Import the module of a registered engine and return the engine class """
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine '{name}', valid options: {', '.join(ENGINES)}")
+    module_name, class_name = ENGINES[name]
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def create_engine(name, board=None, proof_nodes=None, move_cache=None, move_cache_size=1000000, **options):
+    """ Create an engine once, so it can keep its caches and worker processes for the whole game.
+    move_cache is the path of a persistent move cache (an sqlite file) the engine answers known positions from. """
+    engine_class = load_engine_class(name)
+    accepted = inspect.signature(engine_class.__init__).parameters
+    kwargs = {key: value for key, value in options.items() if key in accepted and value is not None}
+    engine = engine_class(board=board, **kwargs)
+    if proof_nodes is None:
+        proof_nodes = DEFAULT_PROOF_NODES if name in PROOF_ENGINES else 0
+    if proof_nodes:
+        from pn_search import ProofFirst
+        engine = ProofFirst(engine, proof_nodes)
+    if move_cache:
+        from move_cache import CachedEngine, MoveCache
+        # The moves of an engine are kept apart from those of other engines and of other settings of the
+        # options that change its play; the search budget options only set the depth of its entries
+        settings = {key: value for key, value in kwargs.items() if key not in ENGINE_OPTIONS}
+        label = f"{name} {json.dumps(settings, sort_keys=True, default=str)}" if settings else name
+        engine = CachedEngine(engine, MoveCache(move_cache, label, move_cache_size))
+    return engine
+
+
+def engine_stats(engine):
+    """ Counters of the caches an engine uses in this process: the shared caches, and its move cache and
+    transposition table if it has them """
+    stats = {"caches": cache_stats()}
+    move_cache = getattr(engine, "cache", None)
+    if move_cache is not None:
+        stats["move_cache"] = move_cache.stats()
+    table = getattr(engine, "shared_table", None)
+    if table is not None:
+        stats["table"] = table.stats()
+    return stats
+
+
+def load_config(path):
+    """ Read engine options from a JSON file, e.g. {"iterations": 4000, "workers": 4} """
+    with open(path) as config_file:
+        config = json.load(config_file)
+    if not isinstance(config, dict):
+        raise ValueError(f"{path} must contain a JSON object of engine options")
+    return config
@@ -0,0 +1,201 @@
+from constants import BOARD_SIZE, TIGER_WIN_GOAT_COUNT
+from rules import CELLS, NEIGHBOURS, JUMPS, MOBILITY_CELLS
+from position import occupancy_bits, position_key
+
+
+# Position and rules of a game, without any drawing.
+# Game adds the screen and mouse handling on top; tournaments and self-play drive it headless.
+class GameState:
+    def __init__(self, repetition_limit=3):
+        # maintain the positions of goats currently placed on board
+        self.goats = []
+        # maintain the positions of tigers on board
+        self.tigers = [(0, 0), (0, BOARD_SIZE), (BOARD_SIZE, 0), (BOARD_SIZE, BOARD_SIZE)]
+        # Total number of goats which are not killed yet
+        # At initial stage, our goat number is 25
+        self.remaining_goat_number = 25
+        self.goats_on_board = 0
+        self.number_of_moves = 0
+        # This list is used to control the movement of goats or tigers in some specified cell
+        # Positions in the list don't have diagonal moves
+        self.restricted_positions = {(1, 0), (3, 0), (0, 1), (2, 1), (4, 1), (1, 2), (3, 2), (0, 3), (2, 3), (4, 3),
+                                     (1, 4), (3, 4)}
+        # Kept up to date as pieces move, so the game status never has to scan the board:
+        # the free cells, the goat cells, the number of moves of every tiger and how many tigers have none
+        self.empty_positions = set(CELLS).difference(self.tigers)
+        self.goat_positions = set()
+        self.tiger_mobility = {tiger: self.count_tiger_moves(tiger) for tiger in self.tigers}
+        self.trapped_tigers = sum(1 for count in self.tiger_mobility.values() if count == 0)
+        # How often every position (with the side to move) occurred. The game is drawn once the current
+        # position occurred repetition_limit times; None turns the rule off.
+        self.repetition_limit = repetition_limit
+        self.position_counts = {}
+        self.repetitions = 0
+        self.record_position(goat_turn=True)
+
+    # Count the current position in the history
+    def record_position(self, goat_turn):
+        key = position_key(occupancy_bits(self.goats), occupancy_bits(self.tigers), self.remaining_goat_number,
+                           goat_turn)
+        self.repetitions = self.position_counts.get(key, 0) + 1
+        self.position_counts[key] = self.repetitions
+
+    # calculate the empty positions of boards to place the goats
+    def get_empty_positions(self):
+        return [cell for cell in CELLS if cell in self.empty_positions]
+
+    def count_tiger_moves(self, tiger):
+        # Steps to a free neighbour plus jumps over a goat to a free cell
+        count = 0
+        for neighbour in NEIGHBOURS[tiger]:
+            if neighbour in self.empty_positions:
+                count += 1
+        for over, landing in JUMPS[tiger]:
+            if over in self.goat_positions and landing in self.empty_positions:
+                count += 1
+        return count
+
+    # Recount the moves of the tigers next to the cells that changed; constant work per move
+    def update_mobility(self, changed_cells):
+        for tiger, old_count in self.tiger_mobility.items():
+            if MOBILITY_CELLS[tiger].isdisjoint(changed_cells):
+                continue
+            count = self.count_tiger_moves(tiger)
+            self.tiger_mobility[tiger] = count
+            self.trapped_tigers += (count == 0) - (old_count == 0)
+
+    # Ask the goat engine for a move and apply it
+    # Returns the move, or None when the engine has no valid move
+    def play_goat_move(self, engine, clock=None):
+        # With a game clock (time_manager.TimeManager) the engine searches for the slice the clock gives it
+        if clock is not None:
+            clock.begin_move(engine, self.remaining_goat_number, self.goats_on_board, self.number_of_moves)
+        new_goat_position = engine.determine_goat_move(self.tigers, self.goats, self.get_empty_positions(),
+                                                       self.remaining_goat_number)
+        if clock is not None:
+            clock.end_move(engine)
+        if new_goat_position is not None:
+            self.apply_goat_move(new_goat_position)
+        return new_goat_position
+
+    def apply_goat_move(self, new_goat_position):
+        # If the first value is null, it means a new goat will place in an empty position
+        # An empty position is return in the second value
+        old_position, new_position = new_goat_position
+        if old_position is None:
+            self.goats.append(new_position)
+            self.goats_on_board += 1
+            self.goat_positions.add(new_position)
+            self.empty_positions.discard(new_position)
+            self.update_mobility((new_position,))
+        # If first value is not None i.e a position
+        # IT indicates that an existing goat on board will move to a position return in second value
+        else:
+            if old_position in self.goat_positions:
+                # replace the old position by the new position
+                self.goats[self.goats.index(old_position)] = new_position
+                self.goat_positions.remove(old_position)
+                self.goat_positions.add(new_position)
+                self.empty_positions.add(old_position)
+                self.empty_positions.discard(new_position)
+                self.update_mobility((old_position, new_position))
+        self.record_position(goat_turn=False)
+
+    # Move a tiger to a free position, capturing the goat it jumps over
+    def move_tiger(self, old_position, new_position):
+        self.tigers.remove(old_position)
+        self.tigers.append(new_position)
+        self.empty_positions.add(old_position)
+        self.empty_positions.discard(new_position)
+        changed_cells = [old_position, new_position]
+        goats_in_path, goat_pos = self.is_goat_in_path(old_position, new_position)
+        if goats_in_path:  # If there are goats in the path, remove the first one
+            self.goats.remove(goat_pos)
+            self.goat_positions.remove(goat_pos)
+            self.empty_positions.add(goat_pos)
+            changed_cells.append(goat_pos)
+            self.goats_on_board -= 1
+            self.remaining_goat_number -= 1
+        # The moved tiger is counted afresh at its new position
+        if self.tiger_mobility.pop(old_position) == 0:
+            self.trapped_tigers -= 1
+        self.tiger_mobility[new_position] = self.count_tiger_moves(new_position)
+        if self.tiger_mobility[new_position] == 0:
+            self.trapped_tigers += 1
+        self.update_mobility(changed_cells)
+        self.number_of_moves += 1
+        self.record_position(goat_turn=True)
+
+    def game_status(self):
+        # Checks if all tigers are trapped
+        if self.trapped_tigers == len(self.tigers):
+            return "Win for Goats"
+        # Checks if all goats are captured
+        if self.remaining_goat_number <= TIGER_WIN_GOAT_COUNT:
+            return "Win for Tigers"
+        # Checks for a position that came back too often
+        if self.repetition_limit and self.repetitions >= self.repetition_limit:
+            return "Draw by repetition"
+        # Checks for stalemate: no valid moves and all goats used
+        if self.number_of_moves >= 100:
+            return "Stalemate"
+        return "On-going"
+
+    # Check if a position is free of both tigers and goats
+    def is_free(self, position):
+        return position in self.empty_positions
+
+    def is_within_bounds(self, position):
+        #Check if a position is within the board boundaries
+        x, y = position
+        return 0 <= x <= BOARD_SIZE and 0 <= y <= BOARD_SIZE
+
+    def is_occupied_by_goat(self, position):
+        #Check if a position is occupied by a goat
+        return position in self.goat_positions
+
+    def can_move(self, tiger):
+        # Check if a tiger can move or jump to capture a goat; diagonal moves are restricted by the board lines
+        return self.tiger_mobility[tiger] > 0
+
+    # This method will check if there is a goat in the path of tiger movement
+    # if so it will return TRUE and the position of goat; otherwise false
+    def is_goat_in_path(self, old_pos, new_pos):
+        path = self.calculate_path(old_pos, new_pos)
+        for pos in path:
+            if pos in self.goat_positions:
+                return True, pos
+        return False, None
+
+    # Calculate total path of a tiger to check if there is a goat in between the path
+    def calculate_path(self, start, end):
+        path = []
+        start_row, start_col = start
+        end_row, end_col = end
+        row_step = (end_row - start_row) // max(abs(end_row - start_row), 1)
+        col_step = (end_col - start_col) // max(abs(end_col - start_col), 1)
+
+        current_row, current_col = start_row + row_step, start_col + col_step
+        while (current_row, current_col) != end:
+            path.append((current_row, current_col))
+            current_row += row_step
+            current_col += col_step
+
+        return path
+
+    # Play a whole game without a screen: the goats move first, then tigers and goats alternate
+    # Returns the final game status
+    def play(self, goat_engine, tiger_policy, clock=None):
+        self.play_goat_move(goat_engine, clock)
+        status = self.game_status()
+        while status == "On-going":
+            tiger_move = tiger_policy.determine_tiger_move(self.tigers, self.goats)
+            if tiger_move is None:
+                return "Win for Goats"
+            self.move_tiger(*tiger_move)
+            status = self.game_status()
+            if status != "On-going":
+                break
+            self.play_goat_move(goat_engine, clock)
+            status = self.game_status()
+        return status
@@ -1,21 +1,52 @@
+import argparse
 import pygame
 import sys
 from game import Game
 from constants import WINDOW_SIZE
+from engines import ENGINES, ENGINE_OPTIONS, load_config
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Play Bagh Bandi against a goat engine")
+    parser.add_argument("algorithm", type=str.lower, help=f"Goat engine: {', '.join(ENGINES)}")
+    parser.add_argument("--iterations", type=int, help="Search iterations per move")
+    parser.add_argument("--time-limit", type=float, help="Search time per move in seconds")
+    parser.add_argument("--workers", type=int, help="Worker processes used by the search")
+    parser.add_argument("--cache-size", type=int, help="Entries kept in the engine caches")
+    parser.add_argument("--max-nodes", type=int, help="Node budget of the search tree")
+    parser.add_argument("--table-size", type=int, help="Entries of the transposition table shared by the workers")
+    parser.add_argument("--proof-nodes", type=int,
+                        help="Node budget of the forced-trap proof (5000 for monte_carlo and beam); 0 turns it off")
+    parser.add_argument("--move-cache", help="Persistent move cache file (sqlite), shared across games and runs")
+    parser.add_argument("--seed", type=int, help="Random seed")
+    parser.add_argument("--time-budget", type=float,
+                        help="Thinking time of the engine for the whole game in seconds, split over its moves")
+    parser.add_argument("--increment", type=float, default=0.0, help="Seconds added to the time budget per move")
+    parser.add_argument("--repetition-limit", type=int, default=3,
+                        help="Draw once a position occurs this often; 0 turns the rule off")
+    parser.add_argument("--telemetry", action="store_true", help="Show the statistics of the engine's searches")
+    parser.add_argument("--config", help="JSON file with engine options; command line flags take precedence")
+    return parser.parse_args()
 
 
 def main():
-    # Command line argument for passing the Algorithm name
-    algorithm = sys.argv[1].lower()
-    if algorithm not in ["random", "bfs", "dfs", "monte_carlo", "astar"]:
-        sys.exit("Invalid Algorithm specified, Valid Options: random, bfs, dfs, astar, monte_carlo")
+    # Command line argument for passing the Algorithm name and the engine options
+    args = parse_arguments()
+    algorithm = args.algorithm
+    if algorithm not in ENGINES:
+        sys.exit(f"Invalid Algorithm specified, Valid Options: {', '.join(ENGINES)}")
+    engine_options = load_config(args.config) if args.config else {}
+    for option in ENGINE_OPTIONS:
+        if getattr(args, option) is not None:
+            engine_options[option] = getattr(args, option)
     # Initialize our game
     pygame.init()
     pygame.font.init()
     screen = pygame.display.set_mode(WINDOW_SIZE)
     pygame.display.set_caption('Bagh Bandi Game')
     # Passing the algorithm name and run the name
-    game = Game(screen, algorithm)
+    game = Game(screen, algorithm, engine_options, args.repetition_limit, args.telemetry, args.time_budget,
+                args.increment)
     game.run()
     sys.exit()
 
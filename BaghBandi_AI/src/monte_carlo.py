@@ -1,29 +1,134 @@
 import random
 import math
-from constants import BOARD_SIZE  # Assuming BOARD_SIZE is defined in constants
+import time
+import multiprocessing
+from constants import BOARD_SIZE, EXPLORATION_CONSTANT, TIGER_WIN_GOAT_COUNT
+from rules import NEIGHBOURS, tiger_moves, jumped_position
+from position import CELL_BIT, NEIGHBOUR_BITS, move_index, occupancy_bits, position_key
+from cache import get_cache, set_cache_size
+from rng import derive_seed, make_rng
+from transposition import SharedTable
+from trap_patterns import tiger_mobility
+
+# Memoized move generation and evaluation, shared with every other search in this process
+_legal_moves_cache = get_cache("legal_moves")
+_adjacency_cache = get_cache("adjacent_to_tiger")
+_result_cache = get_cache("result")
+
+# Shared placeholder for nodes without any untried moves left
+_EMPTY = ()
+
+# Transposition table a pool initializer attached this worker process to, if any
+_shared_table = None
+
+# Score State.get_result gives a game won by the goats; a lost game scores -WIN_SCORE
+WIN_SCORE = 1000
+
+# Default weights of the position features State.compute_result adds up, tuned by tuning.py.
+# Engines may replace some of them (see evaluation_name); their states then use those weights and a
+# result cache of their own.
+EVALUATION_WEIGHTS = {
+    "threatened": 10,  # Penalty for a goat next to a tiger
+    "unprotected": 120,  # Further penalty if nothing blocks the landing square behind it
+    "blocked_by_goat": 100,  # Reward for a goat whose capture is blocked by another goat
+    "blocked_by_tiger": 20,  # Reward for a goat whose capture is blocked by a tiger
+    "protective_neighbour": 10,  # Reward for a goat with a goat next to it
+    "safe_move": 1,  # Reward per free square a goat can step to without being next to a tiger
+    "trapped_tiger": 50,  # Reward per tiger without a move, while others can still move
+    "nearly_trapped_tiger": 15,  # Reward per tiger with a single move left
+}
+
+# Evaluation weights other than the defaults, by the name of their result cache
+_custom_weights = {}
+
+
+def evaluation_name(weights):
+    """ Name of the result cache of the evaluation weights with some or all of them replaced, or None for the
+    defaults. Engines with the same weights share the cache. """
+    if not weights:
+        return None
+    unknown = set(weights) - set(EVALUATION_WEIGHTS)
+    if unknown:
+        raise ValueError(f"Unknown evaluation weights: {', '.join(sorted(unknown))}")
+    merged = dict(EVALUATION_WEIGHTS, **weights)
+    if merged == EVALUATION_WEIGHTS:
+        return None
+    name = "result " + " ".join(f"{key}={merged[key]}" for key in sorted(merged))
+    _custom_weights[name] = merged
+    return name
 
 
 class Node:
-    def __init__(self, move=None, parent=None, state=None):
+    # Nodes only keep what the search needs: no per-node __dict__, no per-node state copy,
+    # and the children/untried_moves containers are dropped once they are no longer needed.
+    # This keeps large trees small enough for millions of nodes.
+    __slots__ = ('move', 'parent', 'children', 'wins', 'visits', 'untried_moves', 'amaf_wins', 'amaf_visits',
+                 'goat_turn', 'proven', 'complete', 'drawn')
+
+    def __init__(self, move=None, parent=None):
+        self.reset(move, parent)
+
+    def reset(self, move, parent):
+        """ (Re)initialise the node, also when it is recycled from a pruned subtree """
         self.move = move
         self.parent = parent
-        self.children = []
+        # Goats and tigers alternate down the tree, starting with the goats at the root
+        self.goat_turn = parent is None or not parent.goat_turn
+        self.children = None
         self.wins = 0
         self.visits = 0
-        self.state = state
-        self.untried_moves = state.get_legal_moves()
-
-    def select_child(self):
-        """Select a child node with the highest UCB1 value."""
-        exploration_constant = 1.5
-        return max(self.children, key=lambda c: (c.wins / c.visits) + math.sqrt(
-            exploration_constant * math.log(self.visits) / c.visits))
-
-    def add_child(self, move, state):
-        """Add a new child node for the given move."""
-        child = Node(move=move, parent=self, state=state)
+        # All-moves-as-first statistics: playouts through the parent in which this move was played later on
+        self.amaf_wins = 0
+        self.amaf_visits = 0
+        # Moves are generated lazily, the first time this node is selected for expansion.
+        # Most nodes are visited once and never need them.
+        self.untried_moves = None
+        # Game-theoretic value once it is known: 1 if the goats win from here, -1 if the tigers do
+        self.proven = None
+        # Whether the moves were generated from the complete move list rather than one tier of it, and whether
+        # a move was dropped as a repetition: a node is only proven lost once all its moves lose, and a
+        # repetition is a draw, not a loss
+        self.complete = False
+        self.drawn = False
+
+    def select_child(self, rave_constant=None, exploration_constant=EXPLORATION_CONSTANT):
+        """Select a child node with the highest UCB1 value, blended with the AMAF value when RAVE is enabled.
+        Results are scored for the goats, so the tigers pick the child with the lowest value.
+        Proven children are only picked when every child is proven: a child that wins for the side to move
+        would have proven this node, so they all lose."""
+        sign = 1 if self.goat_turn else -1
+        if rave_constant is None:
+            return max(self.children, key=lambda c: -math.inf if c.proven is not None else sign * (
+                c.wins / c.visits) + math.sqrt(exploration_constant * math.log(self.visits) / c.visits))
+
+        log_visits = math.log(self.visits)
+
+        def rave_value(c):
+            if c.proven is not None:
+                return -math.inf
+            value = c.wins / c.visits
+            if c.amaf_visits:
+                # The AMAF estimate dominates while the child has few visits of its own
+                beta = math.sqrt(rave_constant / (3 * c.visits + rave_constant))
+                value = (1 - beta) * value + beta * c.amaf_wins / c.amaf_visits
+            return sign * value + math.sqrt(exploration_constant * log_visits / c.visits)
+
+        return max(self.children, key=rave_value)
+
+    def add_child(self, move, free_nodes=None):
+        """Add a new child node for the given move, reusing a recycled node if there is one."""
+        if free_nodes:
+            child = free_nodes.pop()
+            child.reset(move, self)
+        else:
+            child = Node(move=move, parent=self)
         self.untried_moves.remove(move)
-        self.children.append(child)
+        if not self.untried_moves:
+            self.untried_moves = _EMPTY  # Release the list once every move has been tried
+        if self.children is None:
+            self.children = [child]
+        else:
+            self.children.append(child)
         return child
 
     def update(self, result):
@@ -31,63 +136,580 @@ class Node:
         self.visits += 1
         self.wins += result
 
+    def prove_ancestors(self):
+        """ Pass the proven value of this node on to the ancestors it decides. A node is won for its side to
+        move by one winning child, and lost once every move has been tried and every child loses. """
+        node = self
+        while node.parent is not None and node.parent.proven is None:
+            parent = node.parent
+            win = 1 if parent.goat_turn else -1
+            if node.proven == win:
+                parent.proven = win
+            elif parent.complete and not parent.drawn and not parent.untried_moves and \
+                    all(child.proven is not None for child in parent.children):
+                parent.proven = -win
+            else:
+                break
+            node = parent
+
+    def update_amaf(self, played_moves, result):
+        """Credit the result to every child whose move was played later in the same play-out
+        by the side to move at this node. played_moves holds (goat_turn, move) pairs."""
+        for child in self.children:
+            if (self.goat_turn, child.move) in played_moves:
+                child.amaf_visits += 1
+                child.amaf_wins += result
+
     def __repr__(self):
-        return f"[M:{self.move} W/V:{self.wins}/{self.visits} U:{len(self.untried_moves)}]"
+        untried = "?" if self.untried_moves is None else len(self.untried_moves)
+        return f"[M:{self.move} W/V:{self.wins}/{self.visits} U:{untried}]"
 
 
 class MonteCarlo:
-    def __init__(self, board, iterations=2000, time_limit=None):
+    def __init__(self, board, iterations=2000, time_limit=None, widening_constant=None, widening_exponent=0.5,
+                 rave_constant=None, playout_depth=30, workers=1, evaluator=None, leaf_batch=16, cache_size=None,
+                 seed=None, max_nodes=None, prune_ratio=0.75, table_size=None, table_min_visits=8,
+                 exploration_constant=EXPLORATION_CONSTANT, evaluation_weights=None, playout_policy="heavy"):
         self.board = board
+        # Own random number stream; worker processes get streams derived from it, so a seeded search
+        # is reproducible (as long as no time limit cuts it short)
+        self.rng = make_rng(seed)
+        # Number of entries of each shared move generation and evaluation cache
+        if cache_size is not None:
+            set_cache_size(cache_size)
         self.iterations = iterations
+        # Search constants, e.g. from the parameter file written by tuning.py. The evaluation weights only
+        # apply to the states of this engine's searches.
+        self.exploration_constant = exploration_constant
+        self.evaluation_weights = evaluation_weights
+        self.weights_name = evaluation_name(evaluation_weights)
+        # Optional time budget in seconds; the search stops at whichever of both limits comes first
         self.time_limit = time_limit
-
-    def determine_goat_move(self, tigers, goats, empty_positions, remaining_goat_number):
-        root = Node(state=State(tigers, goats, empty_positions, remaining_goat_number))
-
-        for _ in range(self.iterations):
-            node = root
-            state = root.state.clone()
-
-            # Selection
-            while not node.untried_moves and node.children:
-                node = node.select_child()
-                state.do_move(node.move)
-
-            # Expansion
-            if node.untried_moves:
-                m = random.choice(node.untried_moves)
-                state.do_move(m)
-                node = node.add_child(m, state)
-
-            # Simulation
-            while state.get_legal_moves():
-                state.do_move(random.choice(state.get_legal_moves()))
-
-            # Backpropagation
-            while node:
-                result = state.get_result()
+        # With more than one worker every move is searched in parallel processes (root parallelisation).
+        # The process pool is created on first use and kept for the following moves.
+        self.workers = workers
+        self.pool = None
+        # (move, visits) of every root child of the last search, e.g. for self-play training data
+        self.last_root_visits = []
+        # Progressive widening: when widening_constant is set, a node may only have
+        # widening_constant * visits ** widening_exponent children, and children are added
+        # in order of the move prior (protective > escape > safe > any) instead of at random.
+        self.widening_constant = widening_constant
+        self.widening_exponent = widening_exponent
+        # RAVE: when rave_constant is set, every move of a play-out also updates the all-moves-as-first
+        # statistics of the matching children along the selected path. A placement square is usually good
+        # or bad whatever the move order, so these statistics converge in far fewer iterations.
+        # rave_constant is the number of visits at which both estimates weigh the same.
+        self.rave_constant = rave_constant
+        # Play-outs alternate goat and tiger moves and stop after playout_depth moves;
+        # the position reached is then scored with State.get_result.
+        self.playout_depth = playout_depth
+        # Move choice of the play-outs, one of PLAYOUT_POLICIES: "uniform" plays any legal move, "light" prefers
+        # goat moves onto cells no tiger is next to and tiger captures, looked up in bit masks, and "heavy"
+        # plays the tiered legal moves (protective > escape > safe > any). Lighter play-outs are less accurate
+        # but several times cheaper per step.
+        if playout_policy not in PLAYOUT_POLICIES:
+            raise ValueError(f"Unknown playout policy '{playout_policy}', "
+                             f"valid options: {', '.join(PLAYOUT_POLICIES)}")
+        self.playout_policy = playout_policy
+        # Optional learned value function (a value_net.ValueNet or the path of its weights) that scores leaves
+        # instead of play-outs. Leaves are collected and scored leaf_batch at a time in one batched evaluation;
+        # a virtual visit on their path spreads the leaves of one batch over different lines.
+        if isinstance(evaluator, str):
+            from value_net import ValueNet
+            evaluator = ValueNet.load(evaluator)
+        self.evaluator = evaluator
+        self.leaf_batch = leaf_batch
+        # MCTS-Solver: positions where all tigers are trapped or enough goats are captured are proven, and
+        # the proofs are passed up the tree. Proven leaves are backed up with this exact score instead of a
+        # play-out, proven children are no longer selected and the search stops once the root is proven.
+        self.proven_score = 1 if evaluator is not None else WIN_SCORE
+        # Node budget: when the tree reaches max_nodes nodes, the least visited subtrees are pruned until
+        # prune_ratio of the budget is left, and their nodes go to a free list that later expansions reuse.
+        # The tree (and the free list) never hold more than max_nodes nodes, so memory stays flat over
+        # long searches and long-running processes.
+        self.max_nodes = max_nodes
+        self.prune_ratio = prune_ratio
+        self.free_nodes = []
+        self.tree_size = 0
+        # Tree size and pruning counts of the last search
+        self.last_search_stats = {}
+        # Transposition table of table_size entries in shared memory: every search adds its backed-up results
+        # to the entries of the positions on its path, and records the most visited move of each. All worker
+        # processes of a parallel search (and of the analysis and server pools) attach to the same table, so
+        # a leaf that any of them has searched table_min_visits times is scored from the table instead of a
+        # play-out, and with widening the table's best move is expanded first.
+        self.table_size = table_size
+        self.table_min_visits = table_min_visits
+        self.shared_table = None
+
+    def can_expand(self, node, state):
+        """ Generate the moves of a node on first use and tell whether it may get another child """
+        if node.untried_moves is None:
+            # Tiger moves and prioritized goat moves are complete; tiered goat moves are only the first tier
+            node.complete = not node.goat_turn or self.widening_constant is not None
+            node.untried_moves = state.get_moves(prioritized=self.widening_constant is not None) or _EMPTY
+            if self.shared_table is not None and self.widening_constant is not None and node.untried_moves:
+                self.order_by_table(node, state)
+        elif not node.untried_moves and not node.complete and not node.drawn and node.children and \
+                all(child.proven == -1 for child in node.children):
+            # Every move of the tier loses: the rest of the goat moves have to be tried before the node is lost
+            tried = {child.move for child in node.children}
+            node.untried_moves = [m for m in state.get_prioritized_moves() if m not in tried] or _EMPTY
+            node.complete = True
+            if not node.untried_moves:
+                node.children[0].prove_ancestors()
+        if not node.untried_moves:
+            return False
+        if self.widening_constant is None or not node.children:
+            return True
+        return len(node.children) < self.widening_constant * node.visits ** self.widening_exponent
+
+    def order_by_table(self, node, state):
+        """ Move the best move the shared table knows for the node's position to the front """
+        entry = self.shared_table.get(state.history_key())
+        if entry is None or entry[2] < 0:
+            return
+        for i, m in enumerate(node.untried_moves):
+            if move_index(m) == entry[2]:
+                node.untried_moves.insert(0, node.untried_moves.pop(i))
+                return
+
+    def next_untried_move(self, node):
+        """ Pick the move to expand next: the best prior with widening, otherwise a random one """
+        if self.widening_constant is None:
+            return self.rng.choice(node.untried_moves)
+        return node.untried_moves[0]
+
+    def next_acyclic_move(self, node, state, line):
+        """ The move to expand next, skipping moves back to a position of the line; None if there is none """
+        while self.can_expand(node, state):
+            m = self.next_untried_move(node)
+            if state.key_after(m) not in line:
+                return m
+            # A repeated position can only lead to a draw by repetition; a node always has the same line,
+            # so the move is dropped for good, and the node can no longer be proven lost
+            node.untried_moves.remove(m)
+            node.drawn = True
+            if not node.untried_moves:
+                node.untried_moves = _EMPTY
+        return None
+
+    def select_leaf(self, root, root_state):
+        """ Descend from the root to a node that can be expanded, expand it and return it with its state
+        and the keys of the positions on the way down from the root """
+        node = root
+        state = root_state.clone()
+        # Positions on the way down from the root
+        path = [state.history_key()]
+        line = set(path)
+
+        # Selection
+        m = self.next_acyclic_move(node, state, line)
+        depth = 0
+        while m is None and node.children:
+            node = node.select_child(self.rave_constant, self.exploration_constant)
+            state.do_move(node.move)
+            path.append(state.history_key())
+            line.add(path[-1])
+            depth += 1
+            if node.proven is not None:
+                break
+            m = self.next_acyclic_move(node, state, line)
+
+        # Expansion
+        stats = self.last_search_stats
+        if m is not None:
+            state.do_move(m)
+            path.append(state.history_key())
+            if self.free_nodes:
+                stats["recycled_nodes"] += 1
+            node = node.add_child(m, self.free_nodes)
+            self.tree_size += 1
+            stats["nodes"] += 1
+            depth += 1
+            node.proven = state.proven_result()
+            if node.proven is not None:
+                stats["proven_nodes"] += 1
+                node.prove_ancestors()
+        if depth > stats["max_depth"]:
+            stats["max_depth"] = depth
+        return node, state, path
+
+    def simulate(self, state):
+        """ Play out the state and return the (goat_turn, move) pairs that were played.
+        The play-out stops early when it comes back to a position it has already seen. """
+        played_moves = set()
+        seen = {state.history_key()}
+        playout_move = PLAYOUT_POLICIES[self.playout_policy]
+        for _ in range(self.playout_depth):
+            m = playout_move(state, self.rng)
+            if m is None:
+                break
+            played_moves.add((state.goat_turn, m))
+            state.do_move(m)
+            key = state.history_key()
+            if key in seen:
+                break
+            seen.add(key)
+        return played_moves
+
+    def backpropagate(self, node, result, played_moves, visited=False):
+        """ Add the result to the node and its ancestors; visited nodes already counted a virtual visit """
+        while node:
+            if visited:
+                node.wins += result
+            else:
                 node.update(result)
-                node = node.parent
-                
+            if self.rave_constant is not None:
+                if node.children:
+                    node.update_amaf(played_moves, result)
+                if node.parent:
+                    played_moves.add((node.parent.goat_turn, node.move))
+            node = node.parent
+
+    def evaluate_leaves(self, leaves):
+        """ Score a batch of leaves with the evaluator and back their values up """
+        values = self.evaluator.evaluate_states([state for _, state, _ in leaves])
+        for (node, _, path), value in zip(leaves, values):
+            self.backpropagate(node, float(value), set(), visited=True)
+            if self.shared_table is not None:
+                self.share(node, path, float(value))
+
+    def table_result(self, path):
+        """ Mean result of the leaf's position in the shared table, or None while it has too few visits """
+        entry = self.shared_table.get(path[-1])
+        if entry is None or entry[0] < self.table_min_visits:
+            return None
+        self.last_search_stats["table_hits"] += 1
+        return entry[1] / entry[0]
+
+    def share(self, node, path, result):
+        """ Add a backed-up result to the table entries of the positions on the path. A position's best move
+        is set to the move of the child on the path once that child has most of the position's visits. """
+        move = None
+        for key in reversed(path):
+            self.shared_table.add(key, result, move)
+            parent = node.parent
+            move = move_index(node.move) if parent is not None and 2 * node.visits > parent.visits else None
+            node = parent
+
+    def recycle(self, node):
+        """ Put the nodes of a detached subtree on the free list and return how many there were """
+        count = 0
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.children:
+                stack.extend(node.children)
+            # Drop the references, so the recycled nodes do not keep the rest of the subtree alive
+            node.parent = node.children = node.untried_moves = None
+            if len(self.free_nodes) < self.max_nodes:
+                self.free_nodes.append(node)
+            count += 1
+        return count
+
+    def prune(self, root):
+        """ Detach the least visited subtrees until the tree is back to prune_ratio of the node budget.
+        The root and its children are kept, so the move choice still sees every root move. """
+        stats = self.last_search_stats
+        stats["peak_tree_size"] = max(stats["peak_tree_size"], self.tree_size)
+        target = int(self.max_nodes * self.prune_ratio)
+        candidates = []
+        stack = list(root.children or ())
+        while stack:
+            node = stack.pop()
+            if node.children:
+                candidates.extend(node.children)
+                stack.extend(node.children)
+        # A node never has more visits than its parent, so subtrees deep down go first
+        candidates.sort(key=lambda node: node.visits)
+        for node in candidates:
+            if self.tree_size <= target:
+                break
+            parent = node.parent
+            if parent is None:
+                continue  # Already recycled with a pruned ancestor
+            parent.children.remove(node)
+            if not parent.children:
+                parent.children = None
+            # The move may be expanded again later on
+            if parent.untried_moves:
+                parent.untried_moves.append(node.move)
+            else:
+                parent.untried_moves = [node.move]
+            pruned = self.recycle(node)
+            self.tree_size -= pruned
+            stats["pruned_subtrees"] += 1
+            stats["pruned_nodes"] += pruned
+        stats["prunes"] += 1
+
+    def search(self, root_state):
+        """ Grow a search tree from the given state and return its root """
+        root = Node()
+        self.tree_size = 1
+        # Counters of the search, kept for telemetry; the rates are filled in at the end
+        self.last_search_stats = {"iterations": 0, "nodes": 0, "max_depth": 0, "elapsed": 0.0,
+                                  "nodes_per_second": 0.0, "tree_size": 1, "peak_tree_size": 1, "prunes": 0,
+                                  "pruned_subtrees": 0, "pruned_nodes": 0, "recycled_nodes": 0, "proven_nodes": 0,
+                                  "table_hits": 0}
+        start = time.perf_counter()
+        deadline = None if self.time_limit is None else start + self.time_limit
+        leaves = []
+
+        iterations = 0
+        for iterations in range(1, self.iterations + 1):
+            # The first iteration always runs, so that there is a move to play however short the time limit
+            if root.proven is not None or deadline is not None and iterations > 1 and time.perf_counter() > deadline:
+                iterations -= 1
+                break
+            if self.max_nodes is not None and self.tree_size >= self.max_nodes:
+                # Pending leaves must be backed up before their nodes can be pruned
+                if leaves:
+                    self.evaluate_leaves(leaves)
+                    leaves = []
+                self.prune(root)
+            node, state, path = self.select_leaf(root, root_state)
+            result = None
+            if node.proven is None and self.shared_table is not None:
+                result = self.table_result(path)
+            if node.proven is not None:
+                # The exact value needs neither a play-out nor an evaluation
+                result = node.proven * self.proven_score
+                self.backpropagate(node, result, set())
+            elif result is not None:
+                # Another search, maybe in another process, already knows this position well enough
+                self.backpropagate(node, result, set())
+            elif self.evaluator is None:
+                # Simulation and backpropagation
+                played_moves = self.simulate(state)
+                result = state.get_result()
+                self.backpropagate(node, result, played_moves)
+            else:
+                # Virtual visit, the value is added once the batch is evaluated
+                visited = node
+                while visited:
+                    visited.visits += 1
+                    visited = visited.parent
+                leaves.append((node, state, path))
+                if len(leaves) >= self.leaf_batch:
+                    self.evaluate_leaves(leaves)
+                    leaves = []
+            if result is not None and self.shared_table is not None:
+                self.share(node, path, result)
+
+        if leaves:
+            self.evaluate_leaves(leaves)
+        stats = self.last_search_stats
+        stats["tree_size"] = self.tree_size
+        stats["peak_tree_size"] = max(stats["peak_tree_size"], self.tree_size)
+        stats["iterations"] = iterations
+        stats["elapsed"] = time.perf_counter() - start
+        stats["nodes_per_second"] = stats["nodes"] / stats["elapsed"] if stats["elapsed"] else 0.0
+        return root
+
+    def parallel_search(self, root_state):
+        """ Split the iterations over the worker processes and add up their (move, visits, wins) root values.
+        Also returns a move any worker proved to win, or None. """
+        if self.pool is None:
+            if self.shared_table is not None:
+                self.pool = multiprocessing.Pool(self.workers, initializer=_attach_shared_table,
+                                                 initargs=(self.shared_table.handle(),))
+            else:
+                self.pool = multiprocessing.Pool(self.workers)
+        share = -(-self.iterations // self.workers)
+        move_seed = self.rng.getrandbits(64)
+        tasks = [(self, share, root_state, derive_seed(move_seed, "worker", worker))
+                 for worker in range(self.workers)]
+        start = time.perf_counter()
+        visits = {}
+        wins = {}
+        stats = {}
+        winning_move = None
+        for root_values, worker_stats, worker_winning_move in self.pool.map(_search_worker, tasks):
+            winning_move = winning_move or worker_winning_move
+            for move, count, move_wins in root_values:
+                visits[move] = visits.get(move, 0) + count
+                wins[move] = wins.get(move, 0) + move_wins
+            # Counters add up over the workers, depths and tree sizes are the largest of any worker
+            for name, value in worker_stats.items():
+                if name in ("max_depth", "tree_size", "peak_tree_size"):
+                    stats[name] = max(stats.get(name, 0), value)
+                else:
+                    stats[name] = stats.get(name, 0) + value
+        stats["elapsed"] = time.perf_counter() - start
+        stats["nodes_per_second"] = stats["nodes"] / stats["elapsed"] if stats["elapsed"] else 0.0
+        self.last_search_stats = stats
+        return [(move, count, wins[move]) for move, count in visits.items()], winning_move
 
-        if not root.children:
-            print("Legal moves: ", root.state.get_legal_moves())
+    def determine_goat_move(self, tigers, goats, empty_positions, remaining_goat_number):
+        root_state = State(tigers, goats, empty_positions, remaining_goat_number)
+        root_state.weights_name = self.weights_name
+        if self.table_size and self.shared_table is None:
+            # Created before the worker pool, which attaches to it
+            self.shared_table = SharedTable(self.table_size)
+        if self.workers > 1:
+            root_values, winning_move = self.parallel_search(root_state)
+        else:
+            root = self.search(root_state)
+            root_values = [(child.move, child.visits, child.wins) for child in root.children or ()]
+            winning_move = self.winning_move(root)
+            if self.max_nodes is not None:
+                # Keep the nodes of this move's tree for the next search
+                self.recycle(root)
+        self.last_root_visits = [(move, visits) for move, visits, _ in root_values]
+
+        if not root_values:
+            print("Legal moves: ", root_state.get_legal_moves())
             return None  # Handle no valid moves
 
-        return max(root.children, key=lambda c: c.visits).move
+        if winning_move is not None:
+            self.last_search_stats["score"] = self.proven_score
+            return winning_move
+        move, visits, wins = max(root_values, key=lambda move_values: move_values[1])
+        # Average result of the chosen move for the goats
+        self.last_search_stats["score"] = wins / visits if visits else 0.0
+        return move
+
+    def winning_move(self, root):
+        """ A root move proven to win for the goats, or None """
+        for child in root.children or ():
+            if child.proven == 1:
+                return child.move
+        return None
+
+    def close(self):
+        """ Stop the worker processes, if any, and release the transposition table """
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+        if self.shared_table is not None:
+            self.shared_table.close()
+            self.shared_table = None
+
+    def __getstate__(self):
+        # Worker processes get a copy of the engine without the board and the pool
+        state = self.__dict__.copy()
+        state['board'] = None
+        state['pool'] = None
+        state['free_nodes'] = []
+        # Workers attach to the shared table in their pool initializer
+        state['shared_table'] = None
+        return state
+
+
+def _attach_shared_table(handle):
+    """ Pool initializer: attach the worker process to the transposition table of its parent """
+    global _shared_table
+    _shared_table = SharedTable.attach(handle)
+
+
+def _search_worker(task):
+    """ Run one share of a parallel search and return the (move, visits, wins) of every root move,
+    the search stats and the proven winning move, if any """
+    engine, iterations, root_state, seed = task
+    engine.rng = make_rng(seed)
+    engine.workers = 1
+    engine.iterations = iterations
+    engine.shared_table = _shared_table
+    # The weights may not be registered yet in this process
+    evaluation_name(engine.evaluation_weights)
+    root = engine.search(root_state)
+    return ([(child.move, child.visits, child.wins) for child in root.children or ()], engine.last_search_stats,
+            engine.winning_move(root))
+
+
+def uniform_playout_move(state, rng):
+    """ Any legal move of the side to move """
+    if state.is_over():
+        return None
+    if state.goat_turn:
+        safe_moves, risky_moves = state.get_light_moves()
+        moves = safe_moves + risky_moves
+    else:
+        captures, steps = tiger_moves(state.tigers, state.goats)
+        moves = captures + steps
+    return rng.choice(moves) if moves else None
+
+
+def light_playout_move(state, rng):
+    """ A goat move onto a cell no tiger is next to if there is one; a tiger capture if there is one """
+    if state.is_over():
+        return None
+    if state.goat_turn:
+        safe_moves, risky_moves = state.get_light_moves()
+        moves = safe_moves or risky_moves
+    else:
+        captures, steps = tiger_moves(state.tigers, state.goats)
+        moves = captures or steps
+    return rng.choice(moves) if moves else None
+
+
+def heavy_playout_move(state, rng):
+    """ A move of the tiered legal moves """
+    return state.get_playout_move(rng)
 
 
 class State:
-    def __init__(self, tigers, goats, empty_positions, remaining_goat_number):
+    # Name of the evaluation weights and result cache of the state, None for the defaults; clones keep it
+    weights_name = None
+
+    def __init__(self, tigers, goats, empty_positions, remaining_goat_number, goat_turn=True, goat_bits=None,
+                 tiger_bits=None):
         self.tigers = tigers
         self.goats = goats
         self.empty_positions = empty_positions
         self.remaining_goat_number = remaining_goat_number
+        self.goat_turn = goat_turn
+        # Occupancy bit masks, kept up to date by the moves; they make up the position keys of the caches
+        self.goat_bits = occupancy_bits(goats) if goat_bits is None else goat_bits
+        self.tiger_bits = occupancy_bits(tigers) if tiger_bits is None else tiger_bits
+        # Mask of the cells adjacent to a tiger, looked up once per tiger placement
+        self.adjacency_bits = None
+        self.adjacency_key = None
         self.restricted_positions = {(1, 0), (3, 0), (0, 1), (2, 1), (4, 1), (1, 2), (3, 2), (0, 3), (2, 3), (4, 3),
                                      (1, 4), (3, 4)}
 
+    def key(self):
+        """ Compact key of the position, independent of the side to move """
+        return position_key(self.goat_bits, self.tiger_bits, self.remaining_goat_number)
+
+    def history_key(self):
+        """ Key of the position including the side to move, for repetition detection """
+        return position_key(self.goat_bits, self.tiger_bits, self.remaining_goat_number, self.goat_turn)
+
+    def key_after(self, move):
+        """ History key of the position a move leads to, without playing it """
+        start, target = move
+        moved = CELL_BIT[target] if start is None else CELL_BIT[start] | CELL_BIT[target]
+        goat_bits, tiger_bits, remaining = self.goat_bits, self.tiger_bits, self.remaining_goat_number
+        if self.goat_turn:
+            goat_bits ^= moved
+        else:
+            tiger_bits ^= moved
+            captured = jumped_position(move)
+            if captured is not None:
+                goat_bits ^= CELL_BIT[captured]
+                remaining -= 1
+        return position_key(goat_bits, tiger_bits, remaining, not self.goat_turn)
+
     def is_adjacent_to_tiger(self, position):
         """ Check if the given position is adjacent to any tiger, considering restricted diagonal movements. """
+        bit = CELL_BIT.get(position)
+        if bit is None:
+            return self.compute_is_adjacent_to_tiger(position)
+        if self.adjacency_key != self.tiger_bits:
+            self.adjacency_bits = _adjacency_cache.get(self.tiger_bits)
+            if self.adjacency_bits is None:
+                self.adjacency_bits = 0
+                for cell, cell_bit in CELL_BIT.items():
+                    if self.compute_is_adjacent_to_tiger(cell):
+                        self.adjacency_bits |= cell_bit
+                _adjacency_cache.put(self.tiger_bits, self.adjacency_bits)
+            self.adjacency_key = self.tiger_bits
+        return self.adjacency_bits & bit != 0
+
+    def compute_is_adjacent_to_tiger(self, position):
         x, y = position
         normal_directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
         diagonal_directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
@@ -140,39 +762,143 @@ class State:
         return position in self.goats
 
     def do_move(self, move):
-        """ Update the state by performing a move """
-        goat_position, new_position = move
-        if goat_position:
-            self.goats.remove(goat_position)
-            self.goats.append(new_position)
-            self.empty_positions.append(goat_position)
+        """ Update the state by performing a move of the side to move, then pass the turn """
+        if self.goat_turn:
+            goat_position, new_position = move
+            if goat_position:
+                self.goats.remove(goat_position)
+                self.goats.append(new_position)
+                self.empty_positions.append(goat_position)
+                self.goat_bits &= ~CELL_BIT[goat_position]
+            else:
+                self.goats.append(new_position)
+            self.empty_positions.remove(new_position)
+            self.goat_bits |= CELL_BIT[new_position]
         else:
-            self.goats.append(new_position)
+            self.do_tiger_move(move)
+        self.goat_turn = not self.goat_turn
+
+    def do_tiger_move(self, move):
+        """ Move a tiger, capturing the goat it jumps over """
+        tiger_position, new_position = move
+        self.tigers.remove(tiger_position)
+        self.tigers.append(new_position)
+        self.empty_positions.append(tiger_position)
         self.empty_positions.remove(new_position)
+        self.tiger_bits = self.tiger_bits & ~CELL_BIT[tiger_position] | CELL_BIT[new_position]
+        captured = jumped_position(move)
+        if captured is not None:
+            self.goats.remove(captured)
+            self.empty_positions.append(captured)
+            self.goat_bits &= ~CELL_BIT[captured]
+            self.remaining_goat_number -= 1
+
+    def is_over(self):
+        """ Check if enough goats were captured for the tigers to win """
+        return self.remaining_goat_number <= TIGER_WIN_GOAT_COUNT
+
+    def proven_result(self):
+        """ 1 if every tiger is trapped, -1 if enough goats were captured, None while the game goes on """
+        if self.is_over():
+            return -1
+        for tiger in self.tigers:
+            if tiger_mobility(tiger, self.goat_bits, self.tiger_bits):
+                return None
+        return 1
+
+    def get_tiger_moves(self):
+        """ List the tiger moves, captures first """
+        captures, steps = tiger_moves(self.tigers, self.goats)
+        return captures + steps
+
+    def get_moves(self, prioritized=False):
+        """ List the moves of the side to move, optionally every goat move ordered by prior """
+        if self.is_over():
+            return []
+        if not self.goat_turn:
+            return self.get_tiger_moves()
+        if prioritized:
+            return self.get_prioritized_moves()
+        return self.get_legal_moves()
+
+    def get_playout_move(self, rng=random):
+        """ Pick a play-out move for the side to move, or None when the play-out is over.
+        Goats play a random move from the tiered legal moves; tigers use a cheap greedy policy
+        that captures whenever it can and otherwise steps at random. """
+        if self.is_over():
+            return None
+        if self.goat_turn:
+            legal_moves = self.get_legal_moves()
+            return rng.choice(legal_moves) if legal_moves else None
+        captures, steps = tiger_moves(self.tigers, self.goats)
+        if captures:
+            return rng.choice(captures)
+        return rng.choice(steps) if steps else None
+
+    def get_light_moves(self):
+        """ Goat moves looked up in the neighbour masks, split into (safe, risky) by whether a tiger is next to
+        the target cell """
+        occupied = self.goat_bits | self.tiger_bits
+        tiger_reach = 0
+        for tiger in self.tigers:
+            tiger_reach |= NEIGHBOUR_BITS[tiger]
+        safe_moves = []
+        risky_moves = []
+        if self.remaining_goat_number > len(self.goats):
+            for cell in self.empty_positions:
+                (risky_moves if CELL_BIT[cell] & tiger_reach else safe_moves).append((None, cell))
+        for goat in self.goats:
+            if NEIGHBOUR_BITS[goat] & ~occupied:
+                for cell in NEIGHBOURS[goat]:
+                    bit = CELL_BIT[cell]
+                    if not occupied & bit:
+                        (risky_moves if bit & tiger_reach else safe_moves).append((goat, cell))
+        return safe_moves, risky_moves
 
     def get_result(self):
+        key = self.key()
+        cache = _result_cache if self.weights_name is None else get_cache(self.weights_name)
+        result = cache.get(key)
+        if result is None:
+            result = self.compute_result()
+            cache.put(key, result)
+        return result
+
+    def compute_result(self):
         normal_directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
         diagonal_directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
         boundary = [(0, 0), (0, 4), (4, 0), (4, 4)]
         if not self.goats:
-            return -1000  # All goats are captured, tigers win. High penalty.
+            return -WIN_SCORE  # All goats are captured, tigers win. High penalty.
+        if self.is_over():
+            return -WIN_SCORE  # Enough goats are captured, tigers win. High penalty.
 
-        if all(not self.can_move(tiger) for tiger in self.tigers):
-            return 1000  # All tigers are immobilized, goats win. High reward.
+        # Moves of every tiger, looked up in the trap pattern database
+        mobility = [tiger_mobility(tiger, self.goat_bits, self.tiger_bits) for tiger in self.tigers]
+        if not any(mobility):
+            return WIN_SCORE  # All tigers are immobilized, goats win. High reward.
 
+        weights = EVALUATION_WEIGHTS if self.weights_name is None else _custom_weights[self.weights_name]
         score = 0
+        # Reward for progress towards the trap of every tiger
+        for moves in mobility:
+            if moves == 0:
+                score += weights["trapped_tiger"]
+            elif moves == 1:
+                score += weights["nearly_trapped_tiger"]
         for goat in self.goats:
             if self.is_adjacent_to_tiger(goat):
-                score -= 10  # Increased penalty for goats in immediate danger.
+                score -= weights["threatened"]  # Increased penalty for goats in immediate danger.
                 if self.is_unprotected_in_capture_direction(goat):
-                    score -= 120  # High penalty if no protective goat/tiger in the direct line of potential capture.
+                    # High penalty if no protective goat/tiger in the direct line of potential capture.
+                    score -= weights["unprotected"]
 
             # Reward for goats that are protected by another goat when under threat
             if self.is_capture_blocked_by_goat(goat):
-                score += 100  # Increase the reward to reflect the strategic importance of protection.
+                score += weights["blocked_by_goat"]
             # Reward for goats that are protected by another tiger when under threat
             if self.is_capture_blocked_by_tiger(goat):
-                score += 20  # Increase the reward to reflect the strategic importance of protection.
+                score += weights["blocked_by_tiger"]
 
             #  Goat in boundary spaces
             #if goat in boundary:
@@ -180,7 +906,7 @@ class State:
 
             # Reward for goats that are protected by another goat.
             if self.has_protective_neighbor(goat):
-                score += 10  # Increase the reward to reflect the strategic importance of protection.
+                score += weights["protective_neighbour"]
 
             # Reward for goats are escape from imminent threat of capture
             allowed_directions = normal_directions + diagonal_directions if goat not in self.restricted_positions else normal_directions
@@ -188,7 +914,7 @@ class State:
                 nx, ny = goat[0] + direction[0], goat[1] + direction[1]
                 if 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE and self.is_free(
                         (nx, ny)) and not self.is_adjacent_to_tiger((nx, ny)):
-                    score += 1  # Reward for potential safe moves
+                    score += weights["safe_move"]  # Reward for potential safe moves
 
         return score
 
@@ -271,12 +997,14 @@ class State:
                     return True  # There's a tiger, and no protective goat or tiger in the jump position
         return False
 
-    def get_legal_moves(self):
+    def get_threat_moves(self):
+        """ Split the moves around goats adjacent to a tiger into protective placements and escape moves """
         normal_directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
         diagonal_directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-        legal_moves = []
         protective_moves = []
         escape_moves = []
+        # Blocking placements need a goat that is still to be placed
+        can_place = self.remaining_goat_number - len(self.goats) > 0
 
         for goat in self.goats:
             if self.is_adjacent_to_tiger(goat):
@@ -288,51 +1016,68 @@ class State:
                         if self.is_within_bounds(next_position) and self.is_free(next_position):
                             # Check if this position directly blocks the tiger
                             if self.directly_blocks_tiger(goat, next_position):
-                                protective_moves.append((None, next_position))
+                                if can_place:
+                                    protective_moves.append((None, next_position))
                             elif not self.is_adjacent_to_tiger(next_position):
                                 escape_moves.append((goat, next_position))
+        return protective_moves, escape_moves
 
-        # Evaluate and prioritize moves based on strategic importance
-        if protective_moves:
-            # Protective moves are prioritized over escape moves
-            return protective_moves
-
-        # Escape move come after protective moves
-        if escape_moves:
-            return escape_moves
+    def get_regular_moves(self, safe_only):
+        """ List placements and goat moves, optionally only those not adjacent to a tiger """
+        normal_directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+        diagonal_directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+        legal_moves = []
 
-        # Regular safe placements from goats not on the board and not adjacent to tigers
+        # Placements from goats not on the board
         if self.remaining_goat_number - len(self.goats) > 0:
             for empty in self.empty_positions:
-                if not self.is_adjacent_to_tiger(empty):
+                if not safe_only or not self.is_adjacent_to_tiger(empty):
                     legal_moves.append((None, empty))
 
-        #  Regular safe placements from goats on the board and not adjacent to tigers
+        # Moves of goats on the board
         for goat in self.goats:
             allowed_directions = normal_directions if goat in self.restricted_positions else normal_directions + diagonal_directions
             for dx, dy in allowed_directions:
                 nx, ny = goat[0] + dx, goat[1] + dy
-                if 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE and self.is_free(
-                        (nx, ny)) and not self.is_adjacent_to_tiger((nx, ny)):
-                    legal_moves.append((goat, (nx, ny)))
+                if self.is_within_bounds((nx, ny)) and self.is_free((nx, ny)):
+                    if not safe_only or not self.is_adjacent_to_tiger((nx, ny)):
+                        legal_moves.append((goat, (nx, ny)))
+        return legal_moves
+
+    def get_legal_moves(self):
+        key = self.key()
+        legal_moves = _legal_moves_cache.get(key)
+        if legal_moves is None:
+            # Sorted, so that the cached order does not depend on which position filled the cache
+            legal_moves = tuple(sorted(self.compute_legal_moves(), key=move_index))
+            _legal_moves_cache.put(key, legal_moves)
+        return list(legal_moves)
+
+    def compute_legal_moves(self):
+        protective_moves, escape_moves = self.get_threat_moves()
+
+        # Evaluate and prioritize moves based on strategic importance
+        if protective_moves:
+            # Protective moves are prioritized over escape moves
+            return protective_moves
 
+        # Escape move come after protective moves
+        if escape_moves:
+            return escape_moves
+
+        # Regular safe placements and moves, not adjacent to tigers
+        legal_moves = self.get_regular_moves(safe_only=True)
         if legal_moves:
             return legal_moves
 
-        # Regular safe placements from goats not on the board
-        if self.remaining_goat_number - len(self.goats) > 0:
-            for empty in self.empty_positions:
-                legal_moves.append((None, empty))
-
-        #  Regular safe placements from goats on the board
-        for goat in self.goats:
-            allowed_directions = normal_directions if goat in self.restricted_positions else normal_directions + diagonal_directions
-            for dx, dy in allowed_directions:
-                nx, ny = goat[0] + dx, goat[1] + dy
-                if 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE and self.is_free((nx, ny)):
-                    legal_moves.append((goat, (nx, ny)))
+        return self.get_regular_moves(safe_only=False)   # Include all moves
 
-        return legal_moves   # Include all moves
+    def get_prioritized_moves(self):
+        """ List every move once, ordered by a cheap prior: protective > escape > safe > any """
+        protective_moves, escape_moves = self.get_threat_moves()
+        ordered = protective_moves + escape_moves + self.get_regular_moves(safe_only=True) + \
+            self.get_regular_moves(safe_only=False)
+        return list(dict.fromkeys(ordered))
 
     def directly_blocks_tiger(self, goat, next_position):
         """ Check if placing a goat at next_position directly blocks a tiger from capturing the goat at goat_position"""
@@ -344,4 +1089,11 @@ class State:
 
     def clone(self):
         """ Create a deep copy of the current game state """
-        return State(self.tigers.copy(), self.goats.copy(), self.empty_positions.copy(), self.remaining_goat_number)
+        state = State(self.tigers.copy(), self.goats.copy(), self.empty_positions.copy(), self.remaining_goat_number,
+                      self.goat_turn, self.goat_bits, self.tiger_bits)
+        state.weights_name = self.weights_name
+        return state
+
+
+# Play-out policies by name, from the cheapest to the most accurate
+PLAYOUT_POLICIES = {"uniform": uniform_playout_move, "light": light_playout_move, "heavy": heavy_playout_move}
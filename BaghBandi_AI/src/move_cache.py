@@ -0,0 +1,189 @@
+import sqlite3
+import time
+
+from constants import BOARD_SIZE
+from position import CELL_BIT, index_move, move_index, occupancy_bits, position_key
+from rules import CELLS
+
+# The eight symmetries of the board (rotations and reflections). The cells without diagonals are exactly those
+# with an odd row + column, which every symmetry keeps, so symmetric positions play the same.
+SYMMETRIES = [
+    lambda row, col: (row, col),
+    lambda row, col: (col, BOARD_SIZE - row),
+    lambda row, col: (BOARD_SIZE - row, BOARD_SIZE - col),
+    lambda row, col: (BOARD_SIZE - col, row),
+    lambda row, col: (row, BOARD_SIZE - col),
+    lambda row, col: (BOARD_SIZE - row, col),
+    lambda row, col: (col, row),
+    lambda row, col: (BOARD_SIZE - col, BOARD_SIZE - row),
+]
+# Per symmetry: where every cell goes, and where it comes from
+CELL_MAPS = [{cell: symmetry(*cell) for cell in CELLS} for symmetry in SYMMETRIES]
+INVERSE_MAPS = [{image: cell for cell, image in cell_map.items()} for cell_map in CELL_MAPS]
+# Per symmetry and byte of a mask: the transformed bits of every byte value
+BYTE_MAPS = [[[sum(CELL_BIT[cell_map[CELLS[8 * byte + bit]]] for bit in range(8)
+                   if value >> bit & 1 and 8 * byte + bit < len(CELLS)) for value in range(256)]
+              for byte in range(4)] for cell_map in CELL_MAPS]
+
+# Depth recorded for moves the proof search proved to win: no search result replaces them
+PROVEN_DEPTH = 2 ** 31 - 1
+
+
+def transform_bits(bits, symmetry):
+    """ A cell mask under one of the SYMMETRIES """
+    byte_map = BYTE_MAPS[symmetry]
+    return byte_map[0][bits & 0xFF] | byte_map[1][bits >> 8 & 0xFF] | byte_map[2][bits >> 16 & 0xFF] | \
+        byte_map[3][bits >> 24]
+
+
+def canonical_position(goat_bits, tiger_bits, remaining_goat_number):
+    """ (key, symmetry) of the smallest key among the symmetric images of a position """
+    return min((position_key(transform_bits(goat_bits, symmetry), transform_bits(tiger_bits, symmetry),
+                             remaining_goat_number), symmetry) for symmetry in range(len(SYMMETRIES)))
+
+
+def transform_move(move, cell_map):
+    start, target = move
+    return None if start is None else cell_map[start], cell_map[target]
+
+
+class MoveCache:
+    # Persistent position -> move cache in an sqlite file, shared by games, restarts and processes.
+    # Every engine (its name and the options that change how it plays) has its own entries in the file.
+    # Positions are stored once for all their symmetric images, under the smallest key of them, with the move
+    # in that orientation, its score, the depth of the search that chose it and when it was last used.
+    # A new result only replaces a stored one of at most the same depth. Once the file holds more than
+    # max_entries positions, the least recently used tenth is evicted. The database runs in WAL mode with a
+    # busy timeout, so several processes can read and write it at once.
+    def __init__(self, path, engine, max_entries=1000000, timeout=30.0):
+        self.path = path
+        self.engine = engine
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(moves)")]
+        if columns and "engine" not in columns:
+            # A cache file from before the moves were kept per engine
+            self.connection.execute("DROP TABLE moves")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS moves (engine TEXT NOT NULL, key INTEGER NOT NULL, "
+                                "move INTEGER NOT NULL, score REAL, depth INTEGER NOT NULL, used REAL NOT NULL, "
+                                "PRIMARY KEY (engine, key))")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS moves_used ON moves (used)")
+        # The size is checked every check_interval writes rather than on each one
+        self.check_interval = max(min(max_entries // 10, 1000), 1)
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, tigers, goats, remaining_goat_number, min_depth=0):
+        """ (move, score, depth) stored for the position by a search of at least min_depth, or None """
+        key, symmetry = canonical_position(occupancy_bits(goats), occupancy_bits(tigers), remaining_goat_number)
+        row = self.connection.execute("SELECT move, score, depth FROM moves WHERE engine = ? AND key = ? AND "
+                                      "depth >= ?", (self.engine, key, min_depth)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.connection.execute("UPDATE moves SET used = ? WHERE engine = ? AND key = ?",
+                                (time.time(), self.engine, key))
+        move, score, depth = row
+        return transform_move(index_move(move), INVERSE_MAPS[symmetry]), score, depth
+
+    def put(self, tigers, goats, remaining_goat_number, move, score, depth):
+        """ Store the result of a search, unless the position already has one of a deeper search """
+        key, symmetry = canonical_position(occupancy_bits(goats), occupancy_bits(tigers), remaining_goat_number)
+        self.connection.execute(
+            "INSERT INTO moves (engine, key, move, score, depth, used) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (engine, key) DO UPDATE SET move = excluded.move, score = excluded.score, "
+            "depth = excluded.depth, used = excluded.used WHERE excluded.depth >= moves.depth",
+            (self.engine, key, move_index(transform_move(move, CELL_MAPS[symmetry])), score, depth, time.time()))
+        self.writes += 1
+        if self.writes % self.check_interval == 0:
+            self.evict()
+
+    def evict(self):
+        """ Drop the least recently used positions once there are more than max_entries """
+        count = self.connection.execute("SELECT COUNT(*) FROM moves").fetchone()[0]
+        if count > self.max_entries:
+            excess = count - self.max_entries + self.max_entries // 10
+            self.connection.execute("DELETE FROM moves WHERE rowid IN (SELECT rowid FROM moves ORDER BY used LIMIT ?)",
+                                    (excess,))
+
+    def stats(self):
+        count = self.connection.execute("SELECT COUNT(*) FROM moves").fetchone()[0]
+        return {"entries": count, "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses,
+                "writes": self.writes}
+
+    def close(self):
+        self.connection.close()
+
+
+def search_budget(engine):
+    """ Depth of a search that uses the engine's whole budget: the levels of a beam, otherwise its iterations """
+    return getattr(engine, "depth", None) or getattr(engine, "iterations", 0)
+
+
+class CachedEngine:
+    # Wraps a goat engine: positions found in the move cache are answered from it without a search, and the
+    # moves the engine finds are written back with the engine's score and search depth (its iterations).
+    # Only entries at least as deep as the engine's own search would get are answered from, so shallower ones
+    # are searched again and replaced: min_depth if given, otherwise the engine's whole budget, or with a time
+    # limit the depth its searches reach in that time at the speed of its last search.
+    # Every other attribute is the wrapped engine's, as with pn_search.ProofFirst.
+    def __init__(self, engine, cache, min_depth=None):
+        object.__setattr__(self, "engine", engine)
+        object.__setattr__(self, "cache", cache)
+        object.__setattr__(self, "min_depth", min_depth)
+        # Depth per second of the engine's last search
+        object.__setattr__(self, "rate", None)
+
+    def required_depth(self):
+        """ Depth of the entries answered from, or None while it is not known yet """
+        if self.min_depth is not None:
+            return self.min_depth
+        budget = search_budget(self.engine)
+        time_limit = getattr(self.engine, "time_limit", None)
+        # Engines without search statistics always search to their full budget
+        if time_limit is None or not hasattr(self.engine, "last_search_stats"):
+            return budget
+        if self.rate is None:
+            return None
+        return min(budget, int(self.rate * time_limit))
+
+    def determine_goat_move(self, tigers, goats, empty_positions, remaining_goat_number):
+        min_depth = self.required_depth()
+        entry = None if min_depth is None else self.cache.get(tigers, goats, remaining_goat_number, min_depth)
+        if entry is not None:
+            move = entry[0]
+            # The wrapped engine did not search this move
+            if hasattr(self.engine, "last_root_visits"):
+                self.engine.last_root_visits = [(move, 1)]
+            if hasattr(self.engine, "last_search_stats"):
+                self.engine.last_search_stats = {}
+            return move
+        move = self.engine.determine_goat_move(tigers, goats, empty_positions, remaining_goat_number)
+        if move is not None:
+            stats = getattr(self.engine, "last_search_stats", None) or {}
+            prover = getattr(self.engine, "prover", None)
+            proven = prover is not None and prover.last_stats.get("result") == "proven"
+            depth = PROVEN_DEPTH if proven else stats.get("iterations", search_budget(self.engine))
+            if not proven and stats.get("elapsed"):
+                object.__setattr__(self, "rate", stats["iterations"] / stats["elapsed"])
+            self.cache.put(tigers, goats, remaining_goat_number, move, stats.get("score"), depth)
+        return move
+
+    def close(self):
+        try:
+            self.cache.close()
+        finally:
+            if hasattr(self.engine, "close"):
+                self.engine.close()
+
+    def __getattr__(self, name):
+        if name in ("engine", "cache", "min_depth", "rate"):
+            raise AttributeError(name)
+        return getattr(self.engine, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.engine, name, value)
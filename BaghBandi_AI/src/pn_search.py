@@ -0,0 +1,218 @@
+import time
+
+from constants import TIGER_WIN_GOAT_COUNT
+from position import CELL_INDEX, position_key, occupancy_bits
+from rules import CELLS, NEIGHBOURS, JUMPS
+
+# Proof and disproof numbers are capped at INFINITY
+INFINITY = 10 ** 9
+PROVEN = (0, INFINITY)
+DISPROVEN = (INFINITY, 0)
+
+# Neighbour and jump tables over cell indices, so positions can be plain bit masks
+NEIGHBOUR_INDICES = [[CELL_INDEX[neighbour] for neighbour in NEIGHBOURS[cell]] for cell in CELLS]
+JUMP_INDICES = [[(CELL_INDEX[over], CELL_INDEX[landing]) for over, landing in JUMPS[cell]] for cell in CELLS]
+ALL_CELLS = (1 << len(CELLS)) - 1
+
+
+class BudgetExhausted(Exception):
+    pass
+
+
+def cell_indices(bits):
+    """ Indices of the set bits of a mask """
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+def goat_moves(goat_bits, tiger_bits):
+    """ Movement-phase goat moves of a position as (from, to) cell index pairs """
+    empty = ALL_CELLS & ~(goat_bits | tiger_bits)
+    return [(goat, neighbour) for goat in cell_indices(goat_bits) for neighbour in NEIGHBOUR_INDICES[goat]
+            if empty >> neighbour & 1]
+
+
+def tiger_moves(goat_bits, tiger_bits):
+    """ Tiger moves of a position as (from, to, jumped goat or None) cell index triples """
+    empty = ALL_CELLS & ~(goat_bits | tiger_bits)
+    moves = []
+    for tiger in cell_indices(tiger_bits):
+        for neighbour in NEIGHBOUR_INDICES[tiger]:
+            if empty >> neighbour & 1:
+                moves.append((tiger, neighbour, None))
+        for over, landing in JUMP_INDICES[tiger]:
+            if goat_bits >> over & 1 and empty >> landing & 1:
+                moves.append((tiger, landing, over))
+    return moves
+
+
+class ProofNumberSearch:
+    # Depth-first proof-number search (df-pn) for forced goat wins in the movement phase.
+    # Goats to move are OR nodes and tigers to move AND nodes: a position is proven once every tiger is
+    # trapped, and disproven once the tigers captured enough goats, the goats cannot move, the line repeats
+    # a position or it gets longer than max_depth. Only proofs are trusted, so these cut-offs can miss a
+    # win but never claim a false one.
+    # The transposition table is the only memory; the search gives up once it holds max_nodes positions
+    # or has expanded max_nodes of them.
+    def __init__(self, max_nodes=20000, max_depth=40):
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.table = {}
+        self.path = set()
+        self.expanded = 0
+        # Outcome, size and duration of the last proof attempt
+        self.last_stats = {}
+
+    def prove(self, tigers, goats, remaining_goat_number):
+        """ A goat move that forces a trap of every tiger, or None when none was proven within the budget """
+        self.last_stats = {}
+        if len(goats) != remaining_goat_number:
+            return None  # Goats are still being placed
+        start = time.perf_counter()
+        root = (occupancy_bits(goats), occupancy_bits(tigers), remaining_goat_number, True)
+        self.table = {}
+        self.path = set()
+        self.expanded = 0
+        try:
+            self.mid(root, INFINITY, INFINITY, 0)
+            proof = self.proven_move(root)
+            result = "proven" if proof else "disproven"
+        except BudgetExhausted:
+            proof = None
+            result = "unknown"
+        self.last_stats = {"result": result, "nodes": len(self.table), "expanded": self.expanded,
+                           "elapsed": time.perf_counter() - start}
+        # Free the table right away; nothing of it is needed for the next position
+        self.table = {}
+        return proof
+
+    def proven_move(self, root):
+        """ The move of a proven root that leads to a proven child """
+        for move, _, child_key in self.children(root):
+            if self.table[child_key] == PROVEN:
+                goat, target = move[:2]
+                return CELLS[goat], CELLS[target]
+        return None
+
+    def children(self, node):
+        """ (move, child node, child key) of every move of the side to move """
+        goat_bits, tiger_bits, remaining, goat_turn = node
+        result = []
+        if goat_turn:
+            for goat, target in goat_moves(goat_bits, tiger_bits):
+                child = (goat_bits & ~(1 << goat) | 1 << target, tiger_bits, remaining, False)
+                result.append(((goat, target), child, position_key(*child)))
+        else:
+            for tiger, target, over in tiger_moves(goat_bits, tiger_bits):
+                child_goats, child_remaining = goat_bits, remaining
+                if over is not None:
+                    child_goats &= ~(1 << over)
+                    child_remaining -= 1
+                child = (child_goats, tiger_bits & ~(1 << tiger) | 1 << target, child_remaining, True)
+                result.append(((tiger, target, over), child, position_key(*child)))
+        return result
+
+    def initial_value(self, node):
+        """ Exact value of a finished position, otherwise proof and disproof numbers from its mobility """
+        goat_bits, tiger_bits, remaining, goat_turn = node
+        if goat_turn:
+            if remaining <= TIGER_WIN_GOAT_COUNT:
+                return DISPROVEN
+            moves = len(goat_moves(goat_bits, tiger_bits))
+            return (1, moves) if moves else DISPROVEN
+        # The fewer moves the tigers have left, the closer the trap
+        moves = len(tiger_moves(goat_bits, tiger_bits))
+        return (moves, 1) if moves else PROVEN
+
+    def value(self, key, depth):
+        """ Current proof and disproof numbers of a child for the line being searched """
+        if key in self.path or depth > self.max_depth:
+            return DISPROVEN
+        return self.table[key]
+
+    def mid(self, node, proof_threshold, disproof_threshold, depth):
+        """ Search a node until its proof number reaches proof_threshold or its disproof number
+        disproof_threshold, and return both """
+        self.expanded += 1
+        if self.expanded > self.max_nodes:
+            raise BudgetExhausted()
+        key = position_key(*node)
+        goat_turn = node[3]
+        children = self.children(node)
+        for _, child, child_key in children:
+            if child_key not in self.table:
+                self.table[child_key] = self.initial_value(child)
+        if len(self.table) > self.max_nodes:
+            raise BudgetExhausted()
+
+        self.path.add(key)
+        while True:
+            values = [self.value(child_key, depth + 1) for _, _, child_key in children]
+            if goat_turn:
+                proof = min((pn for pn, _ in values), default=INFINITY)
+                disproof = min(sum(dn for _, dn in values), INFINITY)
+            else:
+                proof = min(sum(pn for pn, _ in values), INFINITY)
+                disproof = min((dn for _, dn in values), default=INFINITY)
+            if proof >= proof_threshold or disproof >= disproof_threshold:
+                break
+
+            # Descend into the most promising child, with thresholds that send the search back here
+            # as soon as another child becomes more promising
+            if goat_turn:
+                order = sorted(range(len(values)), key=lambda i: values[i][0])
+                best = order[0]
+                second = values[order[1]][0] if len(order) > 1 else INFINITY
+                child_proof_threshold = min(proof_threshold, second + 1)
+                child_disproof_threshold = min(disproof_threshold - disproof + values[best][1], INFINITY)
+            else:
+                order = sorted(range(len(values)), key=lambda i: values[i][1])
+                best = order[0]
+                second = values[order[1]][1] if len(order) > 1 else INFINITY
+                child_disproof_threshold = min(disproof_threshold, second + 1)
+                child_proof_threshold = min(proof_threshold - proof + values[best][0], INFINITY)
+            _, child, child_key = children[best]
+            self.table[child_key] = self.mid(child, child_proof_threshold, child_disproof_threshold, depth + 1)
+        self.path.discard(key)
+
+        self.table[key] = (proof, disproof)
+        return proof, disproof
+
+
+class ProofFirst:
+    # Wraps a goat engine: in movement-phase positions it first tries to prove a forced trap and plays the
+    # proven move right away. Otherwise the wrapped engine searches as usual. Every other attribute
+    # (rng, time_limit, search statistics, close, ...) is the wrapped engine's.
+    def __init__(self, engine, max_nodes=20000):
+        object.__setattr__(self, "engine", engine)
+        object.__setattr__(self, "prover", ProofNumberSearch(max_nodes))
+
+    def determine_goat_move(self, tigers, goats, empty_positions, remaining_goat_number):
+        start = time.perf_counter()
+        move = self.prover.prove(tigers, goats, remaining_goat_number)
+        if move is None:
+            time_limit = getattr(self.engine, "time_limit", None)
+            if time_limit is None:
+                return self.engine.determine_goat_move(tigers, goats, empty_positions, remaining_goat_number)
+            # The proof attempt counts against the engine's time limit
+            self.engine.time_limit = max(time_limit - (time.perf_counter() - start), 0)
+            try:
+                return self.engine.determine_goat_move(tigers, goats, empty_positions, remaining_goat_number)
+            finally:
+                self.engine.time_limit = time_limit
+        # The wrapped engine did not search this move
+        if hasattr(self.engine, "last_root_visits"):
+            self.engine.last_root_visits = [(move, 1)]
+        if hasattr(self.engine, "last_search_stats"):
+            self.engine.last_search_stats = {}
+        return move
+
+    def __getattr__(self, name):
+        if name in ("engine", "prover"):
+            raise AttributeError(name)
+        return getattr(self.engine, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.engine, name, value)
@@ -0,0 +1,66 @@
+from rules import CELLS, NEIGHBOURS
+
+# Index of every board cell in the flat 25-cell encodings, row by row
+CELL_INDEX = {cell: index for index, cell in enumerate(CELLS)}
+NUMBER_OF_CELLS = len(CELLS)
+
+# Directions in the order used by the move encoding
+MOVE_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+DIRECTION_INDEX = {direction: index for index, direction in enumerate(MOVE_DIRECTIONS)}
+
+# Every move maps to one index: placements first, then single steps, then tiger jumps,
+# each step and jump by its start cell and direction
+STEP_OFFSET = NUMBER_OF_CELLS
+JUMP_OFFSET = STEP_OFFSET + NUMBER_OF_CELLS * len(MOVE_DIRECTIONS)
+MOVE_SPACE = JUMP_OFFSET + NUMBER_OF_CELLS * len(MOVE_DIRECTIONS)
+
+
+def move_index(move):
+    """ Index of a (start, target) move in the flat move encoding; start is None for a placement """
+    start, target = move
+    if start is None:
+        return CELL_INDEX[target]
+    dx, dy = target[0] - start[0], target[1] - start[1]
+    direction = DIRECTION_INDEX[((dx > 0) - (dx < 0), (dy > 0) - (dy < 0))]
+    offset = JUMP_OFFSET if max(abs(dx), abs(dy)) == 2 else STEP_OFFSET
+    return offset + CELL_INDEX[start] * len(MOVE_DIRECTIONS) + direction
+
+
+def index_move(index):
+    """ The (start, target) move of an index of the flat move encoding """
+    if index < STEP_OFFSET:
+        return None, CELLS[index]
+    distance = 2 if index >= JUMP_OFFSET else 1
+    cell, direction = divmod(index - (JUMP_OFFSET if distance == 2 else STEP_OFFSET), len(MOVE_DIRECTIONS))
+    (x, y), (dx, dy) = CELLS[cell], MOVE_DIRECTIONS[direction]
+    return (x, y), (x + distance * dx, y + distance * dy)
+
+
+def occupancy(positions):
+    """ 25-cell 0/1 list marking the given positions """
+    cells = [0] * NUMBER_OF_CELLS
+    for position in positions:
+        cells[CELL_INDEX[position]] = 1
+    return cells
+
+
+# Bit of every cell in the compact position keys
+CELL_BIT = {cell: 1 << index for cell, index in CELL_INDEX.items()}
+
+
+def occupancy_bits(positions):
+    """ 25-bit mask of the given positions """
+    bits = 0
+    for position in positions:
+        bits |= CELL_BIT[position]
+    return bits
+
+
+# Per cell: mask of the cells a piece there can step to. A goat on a cell in the mask of a tiger is next to it;
+# play-out policies look moves up in these masks instead of generating them
+NEIGHBOUR_BITS = {cell: occupancy_bits(NEIGHBOURS[cell]) for cell in CELLS}
+
+
+def position_key(goat_bits, tiger_bits, remaining_goat_number, goat_turn=True):
+    """ Compact, collision-free integer key of a position: goat mask, tiger mask, goats remaining, side to move """
+    return goat_bits | tiger_bits << 25 | remaining_goat_number << 50 | (1 if goat_turn else 0) << 55
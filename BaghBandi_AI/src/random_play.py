@@ -1,12 +1,21 @@
 import math
-import random
 
 from constants import BOARD_SIZE
+from position import move_index, occupancy_bits, position_key
+from rng import make_rng
+from cache import get_cache, set_cache_size
+
+# Legal moves by position. The cache is one of the shared ones, but under a name of its own: monte_carlo's
+# "legal_moves" hold only the moves its play-out policy picks from, these are all moves.
+_legal_moves_cache = get_cache("random_play_moves")
 
 
 class Random_Play:
-    def __init__(self, board, iterations=1000, time_limit=None):
+    def __init__(self, board, iterations=1000, time_limit=None, cache_size=None, seed=None):
         self.board = board
+        self.rng = make_rng(seed)
+        if cache_size is not None:
+            set_cache_size(cache_size)
         self.iterations = iterations
         self.time_limit = time_limit
 
@@ -15,23 +24,25 @@ class Random_Play:
         self.remaining_goat_number = remaining_goat_number
         self.empty_positions = empty_positions
         self.goats = goats
-        legal_moves = self.get_legal_moves()
-        return random.choice(legal_moves)
+        key = position_key(occupancy_bits(goats), occupancy_bits(tigers), remaining_goat_number)
+        legal_moves = _legal_moves_cache.get(key)
+        if legal_moves is None:
+            legal_moves = tuple(sorted(self.get_legal_moves(), key=move_index))
+            _legal_moves_cache.put(key, legal_moves)
+        return self.rng.choice(legal_moves)
 
     def get_legal_moves(self):
-        #List all possible legal moves for the goats, considering safety and restricted positions.
+        #List all possible legal moves for the goats, considering restricted positions.
         normal_directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
         diagonal_directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
         restricted_positions = {
             (1, 0), (3, 0), (0, 1), (2, 1), (4, 1), (1, 2), (3, 2), (0, 3), (2, 3), (4, 3), (1, 4), (3, 4)
         }
 
+        # Unordered: determine_goat_move sorts the moves for the cache and picks one at random
         legal_moves = []
         if self.remaining_goat_number > 0:
-            # Prioritize safe placements before risky ones
-            safe_empty_positions = [empty for empty in self.empty_positions if not self.is_adjacent_to_tiger(empty)]
-            risky_empty_positions = [empty for empty in self.empty_positions if self.is_adjacent_to_tiger(empty)]
-            for empty in safe_empty_positions + risky_empty_positions:
+            for empty in self.empty_positions:
                 legal_moves.append((None, empty))  # None signifies placement of a new goat
 
         # Movement moves
@@ -41,10 +52,7 @@ class Random_Play:
                 nx, ny = goat[0] + dx, goat[1] + dy
                 if 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE and (nx, ny) not in self.tigers and (
                         nx, ny) not in self.goats:
-                    if not self.is_adjacent_to_tiger((nx, ny)):
-                        legal_moves.insert(0, (goat, (nx, ny)))  # Prioritize safer moves
-                    else:
-                        legal_moves.append((goat, (nx, ny)))  # Add risky moves if necessary
+                    legal_moves.append((goat, (nx, ny)))
         return legal_moves
 
     def do_move(self, move):
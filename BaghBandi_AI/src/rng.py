@@ -0,0 +1,14 @@
+import random
+
+
+def derive_seed(seed, *path):
+    """ Seed of an independent sub-stream, e.g. derive_seed(seed, "worker", 3).
+    The same seed and path always give the same result, in every process. """
+    return random.Random(repr((seed,) + path)).getrandbits(64)
+
+
+def make_rng(seed=None, *path):
+    """ Random number generator of its own; seed None draws a fresh seed from the operating system """
+    if seed is None:
+        return random.Random()
+    return random.Random(derive_seed(seed, *path) if path else seed)
@@ -0,0 +1,76 @@
+from constants import BOARD_SIZE
+
+# Positions without diagonal lines: pieces on them only move horizontally or vertically
+RESTRICTED_POSITIONS = {(1, 0), (3, 0), (0, 1), (2, 1), (4, 1), (1, 2), (3, 2), (0, 3), (2, 3), (4, 3), (1, 4), (3, 4)}
+NORMAL_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+DIAGONAL_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+CELLS = [(row, col) for row in range(BOARD_SIZE + 1) for col in range(BOARD_SIZE + 1)]
+
+
+def is_within_bounds(position):
+    """ Check if a position is within the board boundaries """
+    x, y = position
+    return 0 <= x <= BOARD_SIZE and 0 <= y <= BOARD_SIZE
+
+
+def allowed_directions(position):
+    """ Directions a piece may move in from this position """
+    if position in RESTRICTED_POSITIONS:
+        return NORMAL_DIRECTIONS
+    return NORMAL_DIRECTIONS + DIAGONAL_DIRECTIONS
+
+
+# The tables below are computed once at import time, so move generation only does lookups.
+# For every cell: the cells a piece can step to
+NEIGHBOURS = {
+    cell: [(cell[0] + dx, cell[1] + dy) for dx, dy in allowed_directions(cell)
+           if is_within_bounds((cell[0] + dx, cell[1] + dy))]
+    for cell in CELLS
+}
+# For every cell: the (jumped over, landing) cell pairs along which a tiger can capture
+JUMPS = {
+    cell: [((cell[0] + dx, cell[1] + dy), (cell[0] + 2 * dx, cell[1] + 2 * dy)) for dx, dy in allowed_directions(cell)
+           if is_within_bounds((cell[0] + 2 * dx, cell[1] + 2 * dy))]
+    for cell in CELLS
+}
+# For every cell: the cells whose occupancy decides whether a tiger there can move
+MOBILITY_CELLS = {
+    cell: set(NEIGHBOURS[cell]).union(*JUMPS[cell])
+    for cell in CELLS
+}
+
+
+def tiger_moves(tigers, goats):
+    """ List the legal tiger moves as (captures, steps); every move is a (tiger position, new position) pair """
+    goat_set = set(goats)
+    occupied = goat_set.union(tigers)
+    captures = []
+    steps = []
+    for tiger in tigers:
+        for neighbour in NEIGHBOURS[tiger]:
+            if neighbour not in occupied:
+                steps.append((tiger, neighbour))
+        for over, landing in JUMPS[tiger]:
+            if over in goat_set and landing not in occupied:
+                captures.append((tiger, landing))
+    return captures, steps
+
+
+def tiger_can_move(tiger, tigers, goats):
+    """ Check if a tiger can step to a free neighbour or jump over a goat """
+    for neighbour in NEIGHBOURS[tiger]:
+        if neighbour not in tigers and neighbour not in goats:
+            return True
+    for over, landing in JUMPS[tiger]:
+        if over in goats and landing not in tigers and landing not in goats:
+            return True
+    return False
+
+
+def jumped_position(move):
+    """ The goat position a tiger move jumps over, or None for a plain step """
+    (x, y), (nx, ny) = move
+    if abs(nx - x) == 2 or abs(ny - y) == 2:
+        return (x + nx) // 2, (y + ny) // 2
+    return None
@@ -0,0 +1,164 @@
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+from engines import create_engine
+from game_state import GameState
+from position import MOVE_SPACE, NUMBER_OF_CELLS, move_index, occupancy
+from tiger_play import TIGER_POLICIES
+from rng import derive_seed
+
+# One training record per position. Shards are plain .npy files of this structured type,
+# so readers can memory-map them with np.load(path, mmap_mode="r").
+RECORD_DTYPE = np.dtype([
+    ("goats", np.uint8, NUMBER_OF_CELLS),
+    ("tigers", np.uint8, NUMBER_OF_CELLS),
+    ("empty", np.uint8, NUMBER_OF_CELLS),
+    ("goats_remaining", np.uint8),
+    ("goat_to_move", np.uint8),
+    # Goat positions: normalised root visit counts of the search; tiger positions: the move played
+    ("policy", np.float32, MOVE_SPACE),
+    # Final result of the game for the goats: 1 win, 0 draw, -1 loss
+    ("outcome", np.int8),
+])
+
+GAME_OUTCOMES = {"Win for Goats": 1, "Stalemate": 0, "Draw by repetition": 0, "Win for Tigers": -1}
+
+
+class ShardWriter:
+    # Collects records in a fixed-size buffer and writes it out as a shard whenever it is full,
+    # so memory stays bounded however many games are played
+    def __init__(self, directory, prefix, shard_size):
+        self.directory = directory
+        self.prefix = prefix
+        self.buffer = np.zeros(shard_size, dtype=RECORD_DTYPE)
+        self.count = 0
+        self.shards_written = 0
+
+    def add_game(self, records, outcome):
+        """ Add the records of a finished game, now that its outcome is known """
+        for record in records:
+            self.buffer[self.count] = record + (outcome,)
+            self.count += 1
+            if self.count == len(self.buffer):
+                self.flush()
+
+    def flush(self):
+        """ Write the buffered records to a new shard file """
+        if not self.count:
+            return
+        path = os.path.join(self.directory, f"{self.prefix}_{self.shards_written:05d}.npy")
+        # Write to a temporary file first, so readers never see a partial shard
+        with open(path + ".tmp", "wb") as shard_file:
+            np.save(shard_file, self.buffer[:self.count])
+        os.replace(path + ".tmp", path)
+        self.shards_written += 1
+        self.count = 0
+
+
+def encode_position(tigers, goats, remaining_goat_number, goat_to_move, policy):
+    """ Record of one position, without the outcome that is only known at the end of the game """
+    goat_cells = occupancy(goats)
+    tiger_cells = occupancy(tigers)
+    empty_cells = [1 - goat - tiger for goat, tiger in zip(goat_cells, tiger_cells)]
+    return goat_cells, tiger_cells, empty_cells, remaining_goat_number, goat_to_move, policy
+
+
+def visit_distribution(root_visits):
+    """ Normalised visit counts of the root moves over the flat move encoding """
+    policy = np.zeros(MOVE_SPACE, dtype=np.float32)
+    for move, visits in root_visits:
+        policy[move_index(move)] += visits
+    total = policy.sum()
+    return policy / total if total else policy
+
+
+def one_hot(move):
+    policy = np.zeros(MOVE_SPACE, dtype=np.float32)
+    policy[move_index(move)] = 1
+    return policy
+
+
+def play_selfplay_game(engine, tiger_policy):
+    """ Play one headless game and return its position records and final status """
+    game = GameState()
+    records = []
+    status = "On-going"
+    while True:
+        tigers, goats, remaining = list(game.tigers), list(game.goats), game.remaining_goat_number
+        move = game.play_goat_move(engine)
+        if move is not None:
+            root_visits = getattr(engine, "last_root_visits", None) or [(move, 1)]
+            records.append(encode_position(tigers, goats, remaining, 1, visit_distribution(root_visits)))
+        status = game.game_status()
+        if status != "On-going":
+            break
+        tiger_move = tiger_policy.determine_tiger_move(game.tigers, game.goats)
+        if tiger_move is None:
+            status = "Win for Goats"
+            break
+        records.append(encode_position(game.tigers, game.goats, game.remaining_goat_number, 0, one_hot(tiger_move)))
+        game.move_tiger(*tiger_move)
+        status = game.game_status()
+        if status != "On-going":
+            break
+    return records, status
+
+
+def run_worker(task):
+    """ Play a share of the games in one process and write its own shards """
+    worker_id, games, seed, directory, shard_size, goat_engine, tiger_policy, engine_options = task
+    # The engines print while they search
+    sys.stdout = open(os.devnull, "w")
+    engine = create_engine(goat_engine, **dict(engine_options, seed=derive_seed(seed, "goat")))
+    tiger = TIGER_POLICIES[tiger_policy](seed=derive_seed(seed, "tiger"))
+    writer = ShardWriter(directory, f"worker{worker_id:02d}", shard_size)
+    positions = 0
+    for _ in range(games):
+        records, status = play_selfplay_game(engine, tiger)
+        writer.add_game(records, GAME_OUTCOMES[status])
+        positions += len(records)
+    writer.flush()
+    if hasattr(engine, "close"):
+        engine.close()
+    return positions
+
+
+def generate(directory, games, workers, seed=0, shard_size=4096, goat_engine="monte_carlo", tiger_policy="greedy",
+             engine_options=None):
+    """ Play self-play games in parallel worker processes, each streaming to its own shards.
+    Returns the number of positions written. """
+    os.makedirs(directory, exist_ok=True)
+    shares = [games // workers + (1 if worker_id < games % workers else 0) for worker_id in range(workers)]
+    tasks = [(worker_id, share, derive_seed(seed, "worker", worker_id), directory, shard_size, goat_engine,
+              tiger_policy, engine_options or {}) for worker_id, share in enumerate(shares) if share]
+    with multiprocessing.Pool(len(tasks)) as pool:
+        return sum(pool.map(run_worker, tasks))
+
+
+def open_shards(directory):
+    """ Memory-map every shard of a directory, without loading them into memory """
+    return [np.load(path, mmap_mode="r") for path in sorted(glob.glob(os.path.join(directory, "*.npy")))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate self-play training data")
+    parser.add_argument("directory", help="Output directory for the shards")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--shard-size", type=int, default=4096, help="Positions per shard")
+    parser.add_argument("--tiger", default="greedy", choices=TIGER_POLICIES, help="Tiger policy")
+    parser.add_argument("--iterations", type=int, default=500, help="MonteCarlo iterations per move")
+    args = parser.parse_args()
+    positions = generate(args.directory, args.games, args.workers, args.seed, args.shard_size,
+                         tiger_policy=args.tiger, engine_options={"iterations": args.iterations})
+    print(f"Wrote {positions} positions to {args.directory}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from constants import TIGER_WIN_GOAT_COUNT
+from engines import ENGINES, create_engine, engine_stats
+from rules import CELLS
+from transposition import SharedTable
+
+# Pieces of a game: the tigers, and the goats at its start
+TIGER_COUNT = 4
+GOAT_COUNT = 25
+
+# Engines of the current worker process by name, created on first use and kept warm between requests
+_engines = {}
+_engine_options = {}
+# Transposition table shared by the whole pool, if the server has one
+_shared_table = {}
+
+
+def init_worker(engine_options, table_handle=None):
+    """ Runs once in every worker process """
+    # The engines print while they search; keep the server log readable
+    sys.stdout = open(os.devnull, "w")
+    _engine_options.update(engine_options)
+    if table_handle is not None:
+        _shared_table["table"] = SharedTable.attach(table_handle)
+
+
+def compute_move(engine_name, tigers, goats, remaining_goat_number, time_limit):
+    """ Ask a warm engine of this worker process for the goat move of a position.
+    Returns the move and the worker's cache counters after the search. """
+    if engine_name not in _engines:
+        _engines[engine_name] = create_engine(engine_name, **_engine_options)
+        if "table" in _shared_table and hasattr(_engines[engine_name], "shared_table"):
+            _engines[engine_name].shared_table = _shared_table["table"]
+    engine = _engines[engine_name]
+    if time_limit is not None and hasattr(engine, "time_limit"):
+        engine.time_limit = time_limit
+    empty_positions = [cell for cell in CELLS if cell not in tigers and cell not in goats]
+    move = engine.determine_goat_move(tigers, goats, empty_positions, remaining_goat_number)
+    return move, dict(engine_stats(engine), worker=os.getpid(), engine=engine_name)
+
+
+def parse_position(request):
+    """ Validate a move request and return (engine, tigers, goats, remaining goats, time limit) """
+    engine_name = request.get("engine", "monte_carlo")
+    if engine_name not in ENGINES:
+        raise ValueError(f"unknown engine '{engine_name}'")
+    tigers = [tuple(position) for position in request["tigers"]]
+    goats = [tuple(position) for position in request.get("goats", [])]
+    remaining_goat_number = int(request["remaining_goat_number"])
+    for position in tigers + goats:
+        if position not in CELLS:
+            raise ValueError(f"position {list(position)} is not on the board")
+    if len(set(tigers + goats)) != len(tigers) + len(goats):
+        raise ValueError("two pieces on the same position")
+    if len(tigers) != TIGER_COUNT:
+        raise ValueError(f"{len(tigers)} tigers instead of {TIGER_COUNT}")
+    # The remaining goats are those not captured yet: the ones on the board and the ones still to be placed
+    if not len(goats) <= remaining_goat_number <= GOAT_COUNT:
+        raise ValueError(f"remaining_goat_number must be between the {len(goats)} goats on the board and {GOAT_COUNT}")
+    if remaining_goat_number <= TIGER_WIN_GOAT_COUNT:
+        raise ValueError("the tigers have already won this position")
+    time_limit = request.get("time_limit")
+    if time_limit is not None:
+        time_limit = float(time_limit)
+        if not math.isfinite(time_limit) or time_limit <= 0:
+            raise ValueError("time_limit must be a positive number of seconds")
+    return engine_name, tigers, goats, remaining_goat_number, time_limit
+
+
+class MoveServer:
+    # Serves goat moves over HTTP/JSON on a local port:
+    #   POST /move    {"engine": "monte_carlo", "tigers": [[0, 0], ...], "goats": [[2, 2], ...],
+    #                  "remaining_goat_number": 25, "time_limit": 1.0, "session": "any id"}
+    #              -> {"move": [null, [2, 3]], "elapsed": 0.52, "session": "any id"}
+    #   GET /status  -> counters of the server, and the cache counters of every worker and engine as of its
+    #                   last answered request
+    # Searches run in a pool of worker processes. At most max_pending requests are accepted at once,
+    # further ones are rejected right away with 503 so that clients back off instead of queueing forever.
+    def __init__(self, workers, max_pending, default_time_limit, engine_options=None):
+        engine_options = engine_options or {}
+        # With a table_size option the searches of all workers share one transposition table
+        self.table = SharedTable(engine_options["table_size"]) if engine_options.get("table_size") else None
+        self.executor = ProcessPoolExecutor(workers, initializer=init_worker,
+                                            initargs=(engine_options, self.table and self.table.handle()))
+        self.max_pending = max_pending
+        self.default_time_limit = default_time_limit
+        self.pending = 0
+        self.counters = {"served": 0, "rejected": 0, "timed_out": 0, "failed": 0}
+        # Latest cache counters by (worker process, engine)
+        self.worker_stats = {}
+
+    async def handle_move(self, body):
+        try:
+            request = json.loads(body)
+            engine_name, tigers, goats, remaining, time_limit = parse_position(request)
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            return 400, {"error": f"invalid request: {error}"}
+        if self.pending >= self.max_pending:
+            self.counters["rejected"] += 1
+            return 503, {"error": "server busy, retry later"}
+        if time_limit is None:
+            time_limit = self.default_time_limit
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            future = asyncio.get_running_loop().run_in_executor(
+                self.executor, compute_move, engine_name, tigers, goats, remaining, time_limit)
+        except Exception as error:
+            self.pending -= 1
+            self.counters["failed"] += 1
+            return 500, {"error": f"engine failed: {error}"}
+        # A search that outlives its request keeps its worker busy, so its slot is only released once it ends
+        future.add_done_callback(self.release)
+        try:
+            # The engine is asked to stay within the time limit; allow some slack before giving up on it.
+            # Shielded, so that giving up does not cancel the future and release the slot early.
+            move, stats = await asyncio.wait_for(asyncio.shield(future), time_limit * 2 + 1)
+        except asyncio.TimeoutError:
+            self.counters["timed_out"] += 1
+            return 504, {"error": "engine exceeded the time budget"}
+        except Exception as error:
+            self.counters["failed"] += 1
+            return 500, {"error": f"engine failed: {error}"}
+        self.counters["served"] += 1
+        self.worker_stats[stats["worker"], stats["engine"]] = stats
+        return 200, {"move": move, "elapsed": round(time.perf_counter() - start, 4),
+                     "session": request.get("session")}
+
+    def status(self):
+        return dict(self.counters, pending=self.pending, workers=list(self.worker_stats.values()))
+
+    def release(self, future):
+        """ Free the pending slot of a finished search """
+        self.pending -= 1
+        if not future.cancelled():
+            # Retrieved here, since a timed-out request no longer awaits it
+            future.exception()
+
+    async def handle_connection(self, reader, writer):
+        # Requests on one connection are answered in order; the connection stays open until the client closes it
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode("latin-1").strip()
+                    if not line:
+                        break
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                if method == "POST" and path == "/move":
+                    status, response = await self.handle_move(body)
+                elif method == "GET" and path == "/status":
+                    status, response = 200, self.status()
+                else:
+                    status, response = 404, {"error": "not found"}
+
+                payload = json.dumps(response).encode()
+                writer.write(f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving goat moves on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error",
+                503: "Service Unavailable", 504: "Gateway Timeout"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve goat moves over HTTP/JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Engine worker processes")
+    parser.add_argument("--max-pending", type=int, default=64, help="Requests accepted at once before 503")
+    parser.add_argument("--time-limit", type=float, default=1.0, help="Default search time per request")
+    parser.add_argument("--iterations", type=int, default=100000, help="Search iterations, if time allows")
+    parser.add_argument("--max-nodes", type=int, default=200000, help="Node budget of every search tree")
+    parser.add_argument("--table-size", type=int, help="Entries of the transposition table shared by the workers")
+    args = parser.parse_args()
+    server = MoveServer(args.workers, args.max_pending, args.time_limit,
+                        {"iterations": args.iterations, "max_nodes": args.max_nodes, "table_size": args.table_size})
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.executor.shutdown(cancel_futures=True)
+        if server.table is not None:
+            server.table.close()
+
+
+if __name__ == '__main__':
+    main()
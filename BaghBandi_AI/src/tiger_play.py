@@ -0,0 +1,43 @@
+from rules import tiger_moves, JUMPS
+from rng import make_rng
+
+
+class Random_Tiger:
+    # Plays any legal tiger move at random
+    def __init__(self, seed=None):
+        self.rng = make_rng(seed)
+
+    def determine_tiger_move(self, tigers, goats):
+        captures, steps = tiger_moves(tigers, goats)
+        legal_moves = captures + steps
+        return self.rng.choice(legal_moves) if legal_moves else None
+
+
+class Greedy_Tiger:
+    # Captures whenever it can, otherwise prefers steps that threaten a capture on the next move
+    def __init__(self, seed=None):
+        self.rng = make_rng(seed)
+
+    def determine_tiger_move(self, tigers, goats):
+        captures, steps = tiger_moves(tigers, goats)
+        if captures:
+            return self.rng.choice(captures)
+        if not steps:
+            return None
+        goat_set = set(goats)
+        threatening = []
+        for tiger, new_position in steps:
+            occupied = goat_set.union(tigers)
+            occupied.discard(tiger)
+            for over, landing in JUMPS[new_position]:
+                if over in goat_set and landing not in occupied:
+                    threatening.append((tiger, new_position))
+                    break
+        return self.rng.choice(threatening or steps)
+
+
+# Registered tiger policies, used by the headless tournament and self-play runners
+TIGER_POLICIES = {
+    "random": Random_Tiger,
+    "greedy": Greedy_Tiger,
+}
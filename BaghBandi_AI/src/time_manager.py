@@ -0,0 +1,98 @@
+import time
+
+from constants import TIGER_WIN_GOAT_COUNT
+
+# Moves after which a game ends in a stalemate (see GameState.game_status)
+MOVE_LIMIT = 100
+# Movement-phase goat moves a game is expected to last at most; slices assume this many are still to come
+MOVEMENT_HORIZON = 25
+# Weight of a placement on an empty board and on a full one; a movement-phase move weighs 1
+EARLY_PLACEMENT_WEIGHT = 0.2
+LATE_PLACEMENT_WEIGHT = 0.8
+# Extra weight of a movement-phase move one capture away from a loss; it grows with every goat captured,
+# since the closer the loss, the more care a move needs
+DANGER_WEIGHT = 2.0
+# Share of the root visits on the chosen move above which the last search counts as settled, and below
+# which it counts as unsettled; the next slice shrinks or grows by these factors
+SETTLED_SHARE = 0.6
+UNSETTLED_SHARE = 0.3
+SETTLED_FACTOR = 0.75
+UNSETTLED_FACTOR = 1.5
+
+
+class TimeManager:
+    # Game clock of the goat engine: a total budget in seconds plus an increment for every move.
+    # Before each goat move the clock hands the engine a time slice (its time_limit), weighted by the phase of
+    # the game, the goats captured so far, the number of moves still expected and how settled the engine's
+    # last move choice was. The time actually taken, proof search included, is charged to the clock.
+    # A slice never exceeds max_share of the time left (minus a safety margin), so the whole game fits into
+    # the budget plus its increments.
+    def __init__(self, total, increment=0.0, max_share=0.5, safety=0.05, min_slice=0.01):
+        self.total = total
+        self.increment = increment
+        self.max_share = max_share
+        self.safety = safety
+        self.min_slice = min_slice
+        self.remaining = total
+        self.moves = 0
+        # Slice and time taken of the move in progress or the last one
+        self.last_slice = None
+        self.last_used = None
+        self.start = None
+        self.stability_factor = 1.0
+        # Goats at the first move; later moves count the captures from there
+        self.initial_goats = None
+
+    def move_weight(self, goats_to_place, goats_on_board, captured):
+        """ Relative thinking time of a goat move: placements onto an emptier board are easier, and
+        movement-phase moves get harder with every capture """
+        if goats_to_place > 0:
+            crowding = goats_on_board / (goats_on_board + goats_to_place)
+            return EARLY_PLACEMENT_WEIGHT + (LATE_PLACEMENT_WEIGHT - EARLY_PLACEMENT_WEIGHT) * crowding
+        captures_to_lose = max(self.initial_goats - TIGER_WIN_GOAT_COUNT - 1, 1)
+        return 1 + DANGER_WEIGHT * min(captured / captures_to_lose, 1)
+
+    def allocate(self, remaining_goat_number, goats_on_board, number_of_moves):
+        """ Time slice in seconds of the next goat move """
+        goats_to_place = remaining_goat_number - goats_on_board
+        captured = self.initial_goats - remaining_goat_number
+        movement_moves = max(min(MOVE_LIMIT - number_of_moves - goats_to_place, MOVEMENT_HORIZON), 1)
+        # Weights of all moves still expected: the placements left, then the movement phase
+        placements = [self.move_weight(goats_to_place - placed, goats_on_board + placed, captured)
+                      for placed in range(goats_to_place)]
+        movement_weight = self.move_weight(0, remaining_goat_number, captured)
+        weight = placements[0] if placements else movement_weight
+        total_weight = sum(placements) + movement_moves * movement_weight
+        available = self.remaining + self.increment * (goats_to_place + movement_moves - 1)
+        share = available * weight / total_weight * self.stability_factor
+        limit = self.max_share * self.remaining - self.safety
+        return max(min(share, limit), self.min_slice)
+
+    def begin_move(self, engine, remaining_goat_number, goats_on_board, number_of_moves):
+        """ Give the engine its slice of the clock for the coming move """
+        if self.initial_goats is None:
+            self.initial_goats = remaining_goat_number
+        self.last_slice = self.allocate(remaining_goat_number, goats_on_board, number_of_moves)
+        if hasattr(engine, "time_limit"):
+            engine.time_limit = self.last_slice
+        self.start = time.perf_counter()
+        return self.last_slice
+
+    def end_move(self, engine):
+        """ Charge the time taken to the clock, add the increment and note how settled the move choice was """
+        self.last_used = time.perf_counter() - self.start
+        self.remaining += self.increment - self.last_used
+        self.moves += 1
+        root_visits = getattr(engine, "last_root_visits", None)
+        total = sum(visits for _, visits in root_visits) if root_visits else 0
+        self.stability_factor = 1.0
+        if total > 1:
+            share = max(visits for _, visits in root_visits) / total
+            if share >= SETTLED_SHARE:
+                self.stability_factor = SETTLED_FACTOR
+            elif share <= UNSETTLED_SHARE:
+                self.stability_factor = UNSETTLED_FACTOR
+
+    def stats(self):
+        return {"total": self.total, "increment": self.increment, "remaining": self.remaining, "moves": self.moves,
+                "last_slice": self.last_slice, "last_used": self.last_used}
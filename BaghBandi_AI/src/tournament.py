@@ -0,0 +1,213 @@
+import argparse
+import math
+import multiprocessing
+import os
+import signal
+import sys
+from multiprocessing import util
+
+from engines import ENGINES, ENGINE_OPTIONS, create_engine, engine_stats, load_config
+from game_state import GameState
+from tiger_play import TIGER_POLICIES
+from time_manager import TimeManager
+from rng import make_rng
+
+# Engine and tiger policy of the current worker process, created once by init_worker
+_worker = {}
+
+
+def init_worker(goat_engine, tiger_policy, engine_options, repetition_limit, time_control=None):
+    """ Create the engines of a worker process once, so they stay warm for all of its games """
+    # The engines print while they search; keep the tournament output readable
+    sys.stdout = open(os.devnull, "w")
+    _worker["goat"] = create_engine(goat_engine, **engine_options)
+    _worker["tiger"] = TIGER_POLICIES[tiger_policy]()
+    _worker["repetition_limit"] = repetition_limit
+    # (time budget, increment) of every game, or None to search each move for the engine's own limits
+    _worker["time_control"] = time_control
+    # Workers close their engine when they exit, so that the transposition table it created is unlinked;
+    # Pool.terminate stops them with SIGTERM, which closes the engine as well
+    signal.signal(signal.SIGTERM, stop_worker)
+    util.Finalize(None, close_worker, exitpriority=10)
+
+
+def close_worker():
+    # A SIGTERM arriving while the engine is closed waits until the process is gone
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTERM})
+    if hasattr(_worker["goat"], "close"):
+        _worker["goat"].close()
+
+
+def stop_worker(signum, frame):
+    close_worker()
+    os._exit(0)
+
+
+def play_game(seed):
+    """ Play one headless game with the given seed and return (seed, final status, number of moves, counters),
+    the counters being those of the worker's caches so far and of the game's clock, if it had one.
+    The game only depends on its seed: both sides get fresh random streams derived from it, and the
+    transposition table of the worker's engine starts empty. """
+    for side in ("goat", "tiger"):
+        if hasattr(_worker[side], "rng"):
+            _worker[side].rng = make_rng(seed, side)
+    table = getattr(_worker["goat"], "shared_table", None)
+    if table is not None:
+        table.clear()
+    game = GameState(_worker["repetition_limit"])
+    clock = TimeManager(*_worker["time_control"]) if _worker["time_control"] else None
+    status = game.play(_worker["goat"], _worker["tiger"], clock)
+    stats = dict(engine_stats(_worker["goat"]), worker=os.getpid(), clock=clock and clock.stats())
+    return seed, status, game.number_of_moves, stats
+
+
+def expected_score(elo):
+    """ Expected score of a player that is `elo` points stronger """
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def elo_from_score(score):
+    """ Elo difference matching an average score, capped for scores of exactly 0 or 1 """
+    score = min(max(score, 1e-3), 1 - 1e-3)
+    return -400 * math.log10(1 / score - 1)
+
+
+def match_statistics(wins, draws, losses, z=1.96):
+    """ Score, Elo difference and 95% Elo confidence interval of the goat engine.
+    The interval is the Wilson score interval, which stays wide when every game had the same result. """
+    games = wins + draws + losses
+    if not games:
+        raise ValueError("no games to score")
+    score = (wins + draws / 2) / games
+    centre = (score + z ** 2 / (2 * games)) / (1 + z ** 2 / games)
+    margin = z / (1 + z ** 2 / games) * math.sqrt(score * (1 - score) / games + z ** 2 / (4 * games ** 2))
+    return score, elo_from_score(score), (elo_from_score(centre - margin), elo_from_score(centre + margin))
+
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    """ Log-likelihood ratio of H1 (elo1) against H0 (elo0), using the normal approximation of the game scores """
+    # Half a game of each result is added, so that one-sided results (all wins or all losses)
+    # still have a variance and settle the test
+    wins, draws, losses = wins + 0.5, draws + 0.5, losses + 0.5
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    variance = (wins + draws / 4) / games - score ** 2
+    score0, score1 = expected_score(elo0), expected_score(elo1)
+    return games * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+
+def run_match(goat_engine, tiger_policy, games, workers, seed=0, engine_options=None, sprt=None,
+              repetition_limit=3, time_control=None):
+    """ Play up to `games` games over a process pool, one game per task. Every game gets its own seed
+    (seed, seed + 1, ...). With sprt=(elo0, elo1, alpha, beta) the match stops as soon as the SPRT accepts
+    either hypothesis. With time_control=(budget, increment) the goat engine plays every game on a clock.
+    Returns the counts of wins, draws and losses of the goat engine, the SPRT verdict and the counters of the
+    games (see play_game): the latest cache counters of every worker and the clock of every game. """
+    counts = {"Win for Goats": 0, "Draw": 0, "Win for Tigers": 0}
+    stats = {"workers": {}, "clocks": []}
+    verdict = None
+    if sprt:
+        elo0, elo1, alpha, beta = sprt
+        lower, upper = math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+    pool = multiprocessing.Pool(workers, initializer=init_worker,
+                                initargs=(goat_engine, tiger_policy, engine_options or {}, repetition_limit,
+                                          time_control))
+    try:
+        for _, status, _, game_stats in pool.imap_unordered(play_game, range(seed, seed + games)):
+            # Stalemates and draws by repetition both count as draws
+            counts[status if status in counts else "Draw"] += 1
+            stats["workers"][game_stats["worker"]] = game_stats
+            if game_stats["clock"]:
+                stats["clocks"].append(game_stats["clock"])
+            if sprt:
+                llr = sprt_llr(counts["Win for Goats"], counts["Draw"], counts["Win for Tigers"], elo0, elo1)
+                if llr >= upper:
+                    verdict = "H1 accepted"
+                elif llr <= lower:
+                    verdict = "H0 accepted"
+                if verdict:
+                    break
+    finally:
+        pool.terminate()
+    return counts["Win for Goats"], counts["Draw"], counts["Win for Tigers"], verdict, stats
+
+
+def summarise_stats(stats):
+    """ Lines reporting the cache hit rates summed over the workers, and the clock time left after the games """
+    lines = []
+    caches = {}
+    for worker in stats["workers"].values():
+        for cache in worker["caches"]:
+            hits, misses = caches.get(cache["name"], (0, 0))
+            caches[cache["name"]] = hits + cache["hits"], misses + cache["misses"]
+    for name, (hits, misses) in sorted(caches.items()):
+        lookups = hits + misses
+        lines.append(f"Cache {name}: {hits} hits, {misses} misses, hit rate {hits / lookups if lookups else 0.0:.1%}")
+    move_caches = [worker["move_cache"] for worker in stats["workers"].values() if "move_cache" in worker]
+    if move_caches:
+        hits = sum(cache["hits"] for cache in move_caches)
+        misses = sum(cache["misses"] for cache in move_caches)
+        lines.append(f"Move cache: {hits} hits, {misses} misses, {move_caches[-1]['entries']} positions stored")
+    tables = [worker["table"] for worker in stats["workers"].values() if "table" in worker]
+    if tables:
+        lines.append(f"Transposition tables: {sum(table['used'] for table in tables)} of "
+                     f"{sum(table['entries'] for table in tables)} entries used at the end of the last games")
+    if stats["clocks"]:
+        remaining = [clock["remaining"] for clock in stats["clocks"]]
+        lines.append(f"Clock: {sum(remaining) / len(remaining):.2f} s left after a game on average, "
+                     f"{min(remaining):.2f} s at least, of {stats['clocks'][0]['total']:.2f} s")
+    return lines
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Play goat engines against tiger policies")
+    parser.add_argument("goat", type=str.lower, choices=ENGINES, help="Goat engine")
+    parser.add_argument("tiger", type=str.lower, choices=TIGER_POLICIES, help="Tiger policy")
+    parser.add_argument("--games", type=int, default=100, help="Maximum number of games")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes, one game each")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first game")
+    parser.add_argument("--sprt", type=float, nargs=4, metavar=("ELO0", "ELO1", "ALPHA", "BETA"),
+                        help="Stop early once the SPRT between both Elo hypotheses is settled")
+    parser.add_argument("--iterations", type=int, help="Search iterations per move")
+    parser.add_argument("--time-limit", type=float, help="Search time per move in seconds")
+    parser.add_argument("--cache-size", type=int, help="Entries kept in the engine caches")
+    parser.add_argument("--max-nodes", type=int, help="Node budget of the search tree")
+    parser.add_argument("--table-size", type=int,
+                        help="Entries of each worker's transposition table; cleared before every game, so games "
+                             "stay reproducible")
+    parser.add_argument("--proof-nodes", type=int,
+                        help="Node budget of the forced-trap proof (5000 for monte_carlo and beam); 0 turns it off")
+    parser.add_argument("--move-cache", help="Persistent move cache file (sqlite), shared across games and runs")
+    parser.add_argument("--time-budget", type=float, help="Thinking time of the engine per game in seconds")
+    parser.add_argument("--increment", type=float, default=0.0, help="Seconds added to the time budget per move")
+    parser.add_argument("--repetition-limit", type=int, default=3,
+                        help="Draw once a position occurs this often; 0 turns the rule off")
+    parser.add_argument("--config", help="JSON file with engine options")
+    args = parser.parse_args()
+    if args.games < 1:
+        parser.error("--games must be at least 1")
+    return args
+
+
+def main():
+    args = parse_arguments()
+    engine_options = load_config(args.config) if args.config else {}
+    for option in ENGINE_OPTIONS:
+        # The workers flag sets the tournament pool; each game searches in a single process
+        if option not in ("workers", "seed") and getattr(args, option) is not None:
+            engine_options[option] = getattr(args, option)
+    wins, draws, losses, verdict, stats = run_match(args.goat, args.tiger, args.games, args.workers, args.seed,
+                                             engine_options, args.sprt, args.repetition_limit,
+                                             (args.time_budget, args.increment) if args.time_budget else None)
+    score, elo, (elo_low, elo_high) = match_statistics(wins, draws, losses)
+    print(f"{args.goat} vs {args.tiger}: {wins + draws + losses} games, "
+          f"+{wins} ={draws} -{losses}, win rate {wins / (wins + draws + losses):.1%}")
+    print(f"Score {score:.3f}, Elo {elo:+.0f} (95% CI {elo_low:+.0f} .. {elo_high:+.0f})")
+    if verdict:
+        print(f"SPRT: {verdict}")
+    for line in summarise_stats(stats):
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
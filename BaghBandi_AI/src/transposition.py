@@ -0,0 +1,124 @@
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# One table entry: position key (+1, so that 0 marks a free slot), visits and summed results of the searches
+# through the position, and the index of its best known move (-1 if none)
+ENTRY_DTYPE = np.dtype([("key", np.uint64), ("visits", np.int64), ("value", np.float64), ("move", np.int16)])
+# Slots of a bucket: a key is stored in one of the slots of its bucket, the least visited of them being replaced
+# once they are all taken
+PROBES = 8
+# Position keys keep the goat mask in their low bits; multiplying spreads every bit over the slot index
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+class SharedTable:
+    # Fixed-size transposition table in shared memory, open-addressed within buckets of PROBES slots.
+    # Worker processes attach to it by name, so the searches of all of them read and add to the same
+    # entries. Writes lock one of `stripes` locks, chosen by bucket, so every slot a write may touch is
+    # covered by the lock it holds, and concurrent writers rarely wait on each other. Reads take no lock:
+    # they re-check the key after reading an entry, and writers publish the key of a new entry last.
+    def __init__(self, entries, stripes=64, name=None, locks=None):
+        self.entries = entries
+        self.buckets = max(entries // PROBES, 1)
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=entries * ENTRY_DTYPE.itemsize)
+            self.owner = True
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.locks = locks if locks is not None else [multiprocessing.Lock() for _ in range(stripes)]
+        table = np.ndarray(entries, dtype=ENTRY_DTYPE, buffer=self.memory.buf)
+        if self.owner:
+            table[:] = 0
+            table["move"] = -1
+        self.keys = table["key"]
+        self.visits = table["visits"]
+        self.values = table["value"]
+        self.moves = table["move"]
+
+    def handle(self):
+        """ What a worker process needs to attach: pass it to the pool initializer, the locks cannot be
+        sent along with tasks """
+        return self.memory.name, self.entries, self.locks
+
+    @classmethod
+    def attach(cls, handle):
+        name, entries, locks = handle
+        return cls(entries, name=name, locks=locks)
+
+    def bucket(self, key):
+        """ Index of the bucket of a key """
+        return ((key * HASH_MULTIPLIER & 0xFFFFFFFFFFFFFFFF) >> 16) % self.buckets
+
+    def slots(self, bucket):
+        """ Slots of a bucket """
+        return range(bucket * PROBES, min((bucket + 1) * PROBES, self.entries))
+
+    def find(self, key):
+        """ Slot holding the key, or None """
+        stored = key + 1
+        for slot in self.slots(self.bucket(key)):
+            if self.keys[slot] == stored:
+                return slot
+            if self.keys[slot] == 0:
+                return None
+        return None
+
+    def get(self, key):
+        """ (visits, summed value, best move index) of a position, or None if it is not in the table """
+        slot = self.find(key)
+        if slot is None:
+            return None
+        entry = int(self.visits[slot]), float(self.values[slot]), int(self.moves[slot])
+        # The slot may have been given to another key while it was read
+        if self.keys[slot] != key + 1:
+            return None
+        return entry
+
+    def add(self, key, value, move_index=None):
+        """ Add one visit with the given result to a position, and optionally set its best move """
+        stored = key + 1
+        bucket = self.bucket(key)
+        with self.locks[bucket % len(self.locks)]:
+            # Take the key's own slot or the first free one; if the bucket is full, replace the slot with
+            # the fewest visits
+            slots = self.slots(bucket)
+            replace = slots[0]
+            for slot in slots:
+                if self.keys[slot] == stored or self.keys[slot] == 0:
+                    replace = slot
+                    break
+                if self.visits[slot] < self.visits[replace]:
+                    replace = slot
+            if self.keys[replace] == stored:
+                self.visits[replace] += 1
+                self.values[replace] += value
+                if move_index is not None:
+                    self.moves[replace] = move_index
+                return
+            # Free the slot while the new entry is written and publish its key last, so that a reader never
+            # pairs the new key with the old entry
+            self.keys[replace] = 0
+            self.visits[replace] = 1
+            self.values[replace] = value
+            self.moves[replace] = -1 if move_index is None else move_index
+            self.keys[replace] = stored
+
+    def clear(self):
+        """ Drop every entry; only while no other process uses the table """
+        self.keys[:] = 0
+        self.visits[:] = 0
+        self.values[:] = 0
+        self.moves[:] = -1
+
+    def stats(self):
+        return {"entries": self.entries, "used": int(np.count_nonzero(self.keys))}
+
+    def close(self):
+        """ Detach; the process that created the table also frees it """
+        self.keys = self.visits = self.values = self.moves = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
@@ -0,0 +1,117 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from position import CELL_INDEX
+from rules import CELLS, NEIGHBOURS, JUMPS
+
+# Pattern database of tiger mobility: for every tiger cell and every occupancy of the cells around it
+# (each line neighbour empty, goat or tiger; each landing cell of a jump free or not) the number of moves a
+# tiger there has. 0 is a trapped tiger, 1 a nearly trapped one. The lines come from rules.NEIGHBOURS and
+# rules.JUMPS, so the cells without diagonals are taken into account.
+# The database is built offline with `python trap_patterns.py` and loaded from PATTERN_FILE; without the file it
+# is built in memory on import, which takes a moment.
+PATTERN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "trap_patterns.npy")
+
+# The occupancy code of a cell's neighbourhood is a mixed-radix number: the base-3 states of its neighbours
+# above the bits of its landing cells. It is put together from per-byte parts of the goat and tiger masks,
+# so a lookup takes the same few steps for every cell.
+BYTE_BITS = 8
+BYTES = (len(CELLS) + BYTE_BITS - 1) // BYTE_BITS
+EMPTY, GOAT, TIGER = 0, 1, 2
+
+
+def pattern_size(cell):
+    return 3 ** len(NEIGHBOURS[cell]) * 2 ** len(JUMPS[cell])
+
+
+# Start of every cell's patterns in the database
+OFFSETS = {}
+_offset = 0
+for _cell in CELLS:
+    OFFSETS[_cell] = _offset
+    _offset += pattern_size(_cell)
+PATTERN_COUNT = _offset
+
+
+def cell_weights(cell):
+    """ Code added by a goat and by a tiger on every board cell, for a tiger on the given cell """
+    goat = np.zeros(len(CELLS), dtype=np.int64)
+    tiger = np.zeros(len(CELLS), dtype=np.int64)
+    landing_bits = 2 ** len(JUMPS[cell])
+    for digit, neighbour in enumerate(NEIGHBOURS[cell]):
+        goat[CELL_INDEX[neighbour]] = GOAT * 3 ** digit * landing_bits
+        tiger[CELL_INDEX[neighbour]] = TIGER * 3 ** digit * landing_bits
+    # A landing cell is blocked by any piece
+    for bit, (_, landing) in enumerate(JUMPS[cell]):
+        goat[CELL_INDEX[landing]] = tiger[CELL_INDEX[landing]] = 1 << bit
+    return goat, tiger
+
+
+def byte_tables(weights):
+    """ For every byte of a mask and every value of it, the code its set bits add up to """
+    values = np.arange(1 << BYTE_BITS)
+    bits = (values[:, None] >> np.arange(BYTE_BITS)) & 1
+    padded = np.zeros(BYTES * BYTE_BITS, dtype=np.int64)
+    padded[:len(weights)] = weights
+    return [(bits @ padded[i * BYTE_BITS:(i + 1) * BYTE_BITS]).tolist() for i in range(BYTES)]
+
+
+# Per cell: (goat byte tables, tiger byte tables), with the cell's offset folded into the first goat table
+CODE_TABLES = {}
+for _cell in CELLS:
+    _goat, _tiger = (byte_tables(weights) for weights in cell_weights(_cell))
+    _goat[0] = [code + OFFSETS[_cell] for code in _goat[0]]
+    CODE_TABLES[_cell] = (_goat, _tiger)
+
+
+def build_patterns():
+    """ Number of moves of a tiger for every pattern of every cell """
+    patterns = np.zeros(PATTERN_COUNT, dtype=np.uint8)
+    for cell in CELLS:
+        neighbours, jumps = NEIGHBOURS[cell], JUMPS[cell]
+        codes = np.arange(pattern_size(cell))
+        landings_blocked = codes % 2 ** len(jumps)
+        states = [(codes // 2 ** len(jumps) // 3 ** digit) % 3 for digit in range(len(neighbours))]
+        moves = sum((state == EMPTY).astype(np.uint8) for state in states)
+        for bit, (over, _) in enumerate(jumps):
+            goat_to_jump = states[neighbours.index(over)] == GOAT
+            moves = moves + (goat_to_jump & ((landings_blocked >> bit) & 1 == 0)).astype(np.uint8)
+        patterns[OFFSETS[cell]:OFFSETS[cell] + len(codes)] = moves
+    return patterns
+
+
+def load_patterns(path=PATTERN_FILE):
+    """ The pattern database as bytes, read from its file if it was built, otherwise built now """
+    if os.path.exists(path):
+        patterns = np.load(path)
+        if len(patterns) == PATTERN_COUNT:
+            return patterns.tobytes()
+    return build_patterns().tobytes()
+
+
+PATTERNS = load_patterns()
+
+
+def tiger_mobility(cell, goat_bits, tiger_bits):
+    """ Number of moves of a tiger on the given cell, looked up in the pattern database """
+    goat, tiger = CODE_TABLES[cell]
+    return PATTERNS[goat[0][goat_bits & 0xFF] + goat[1][goat_bits >> 8 & 0xFF] + goat[2][goat_bits >> 16 & 0xFF]
+                    + goat[3][goat_bits >> 24] + tiger[0][tiger_bits & 0xFF] + tiger[1][tiger_bits >> 8 & 0xFF]
+                    + tiger[2][tiger_bits >> 16 & 0xFF] + tiger[3][tiger_bits >> 24]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the tiger trap pattern database")
+    parser.add_argument("--output", default=PATTERN_FILE, help="File to write the database to")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    patterns = build_patterns()
+    np.save(args.output, patterns)
+    print(f"Wrote {len(patterns)} patterns to {args.output} in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from engines import create_engine
+from game_state import GameState
+from monte_carlo import EVALUATION_WEIGHTS, EXPLORATION_CONSTANT
+from rng import derive_seed, make_rng
+from tiger_play import TIGER_POLICIES
+
+# Tuned parameters: (name, start value, step scale, lower bound, upper bound).
+# SPSA works on value / scale, so one unit of perturbation is a comparable change for every parameter.
+PARAMETERS = [("exploration_constant", EXPLORATION_CONSTANT, 0.25, 0.05, 10.0)] + [
+    (name, float(value), max(1.0, value / 4), 0.0, 10.0 * max(value, 10)) for name, value in EVALUATION_WEIGHTS.items()]
+
+GAME_SCORES = {"Win for Goats": 1.0, "Win for Tigers": 0.0}
+
+# Options of the worker processes, set once by init_worker
+_worker = {}
+
+
+def init_worker(tiger_policy, engine_options, repetition_limit):
+    """ Runs once in every worker process """
+    # The engines print while they search
+    sys.stdout = open(os.devnull, "w")
+    _worker.update(tiger_policy=tiger_policy, engine_options=engine_options, repetition_limit=repetition_limit)
+
+
+def to_options(values):
+    """ Engine options of a parameter vector: the format of the parameter file engines load as config """
+    options = {"exploration_constant": values["exploration_constant"]}
+    options["evaluation_weights"] = {name: value for name, value in values.items() if name != "exploration_constant"}
+    return options
+
+
+def play_game(task):
+    """ Play one headless game of monte_carlo with the given parameters against the tiger policy.
+    Returns (side, goat score): 1 for a goat win, 0 for a loss and 0.5 for any draw. """
+    side, values, seed = task
+    options = dict(_worker["engine_options"], **to_options(values))
+    # No proof search: it plays the same forced traps whatever the parameters
+    engine = create_engine("monte_carlo", proof_nodes=0, seed=derive_seed(seed, "goat"), **options)
+    tiger = TIGER_POLICIES[_worker["tiger_policy"]](seed=derive_seed(seed, "tiger"))
+    status = GameState(_worker["repetition_limit"]).play(engine, tiger)
+    return side, GAME_SCORES.get(status, 0.5)
+
+
+class SPSA:
+    # Simultaneous perturbation stochastic approximation over the PARAMETERS: every iteration perturbs all
+    # parameters at once by +-c_k, plays the same game seeds with both perturbed settings and moves the
+    # parameters along the estimated gradient of the goats' score. Two matches per iteration, whatever the
+    # number of parameters. The gains follow Spall's recommended schedule.
+    def __init__(self, a=4.0, c=1.0, stability=10, alpha=0.602, gamma=0.101):
+        self.a = a
+        self.c = c
+        self.stability = stability
+        self.alpha = alpha
+        self.gamma = gamma
+        self.iteration = 0
+        self.theta = {name: value / scale for name, value, scale, _, _ in PARAMETERS}
+        # (iteration, score of theta+, score of theta-) of every iteration so far
+        self.history = []
+
+    def values(self, theta=None):
+        """ Parameter values of a point of the scaled search space, clipped to their bounds """
+        theta = self.theta if theta is None else theta
+        return {name: min(max(theta[name] * scale, lower), upper) for name, _, scale, lower, upper in PARAMETERS}
+
+    def perturbations(self, rng):
+        """ Random +-1 direction of every parameter """
+        return {name: rng.choice((-1, 1)) for name, _, _, _, _ in PARAMETERS}
+
+    def step(self, delta, plus_score, minus_score):
+        """ Move theta along the gradient estimated from the scores of theta + c_k delta and theta - c_k delta """
+        k = self.iteration
+        a_k = self.a / (k + 1 + self.stability) ** self.alpha
+        c_k = self.c / (k + 1) ** self.gamma
+        for name, _, scale, lower, upper in PARAMETERS:
+            gradient = (plus_score - minus_score) / (2 * c_k * delta[name])
+            # The goats' score is maximised; theta stays within the bounds
+            self.theta[name] = min(max(self.theta[name] + a_k * gradient, lower / scale), upper / scale)
+        self.history.append((k, plus_score, minus_score))
+        self.iteration += 1
+
+    def perturbed(self, delta):
+        """ Parameter values of theta + c_k delta and theta - c_k delta """
+        c_k = self.c / (self.iteration + 1) ** self.gamma
+        plus = {name: value + c_k * delta[name] for name, value in self.theta.items()}
+        minus = {name: value - c_k * delta[name] for name, value in self.theta.items()}
+        return self.values(plus), self.values(minus)
+
+    def state(self):
+        return {"iteration": self.iteration, "theta": self.theta, "history": self.history,
+                "gains": {"a": self.a, "c": self.c, "stability": self.stability}}
+
+    def load_state(self, state):
+        self.iteration = state["iteration"]
+        self.theta.update(state["theta"])
+        self.history = [tuple(entry) for entry in state["history"]]
+
+
+def write_json(path, data):
+    """ Write a JSON file atomically, so an interrupted run never leaves a broken checkpoint """
+    with open(path + ".tmp", "w") as json_file:
+        json.dump(data, json_file, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def tune(output, iterations, games, workers, checkpoint=None, seed=0, tiger_policy="greedy", engine_options=None,
+         repetition_limit=3, spsa=None):
+    """ Run SPSA iterations of `games` game pairs each over a process pool. The checkpoint (if any) is
+    resumed from and rewritten after every iteration, and so is the parameter file at `output`. """
+    spsa = spsa or SPSA()
+    if checkpoint and os.path.exists(checkpoint):
+        with open(checkpoint) as checkpoint_file:
+            spsa.load_state(json.load(checkpoint_file))
+        print(f"Resuming from iteration {spsa.iteration}")
+    pool = multiprocessing.Pool(workers, initializer=init_worker,
+                                initargs=(tiger_policy, engine_options or {}, repetition_limit))
+    try:
+        while spsa.iteration < iterations:
+            start = time.perf_counter()
+            # The same directions and seeds whenever an iteration is run again after a restart
+            rng = make_rng(seed, "iteration", spsa.iteration)
+            delta = spsa.perturbations(rng)
+            plus, minus = spsa.perturbed(delta)
+            # Both sides play the same seeds, which cancels much of the noise of the games
+            seeds = [derive_seed(seed, "game", spsa.iteration, game) for game in range(games)]
+            tasks = [("plus", plus, game_seed) for game_seed in seeds] + \
+                    [("minus", minus, game_seed) for game_seed in seeds]
+            scores = {"plus": 0.0, "minus": 0.0}
+            for side, score in pool.imap_unordered(play_game, tasks):
+                scores[side] += score
+            spsa.step(delta, scores["plus"] / games, scores["minus"] / games)
+            if checkpoint:
+                write_json(checkpoint, spsa.state())
+            write_json(output, to_options(spsa.values()))
+            print(f"Iteration {spsa.iteration}/{iterations}: {scores['plus'] / games:.3f} vs "
+                  f"{scores['minus'] / games:.3f} ({time.perf_counter() - start:.0f} s)", flush=True)
+    finally:
+        pool.terminate()
+    return spsa.values()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the monte_carlo evaluation weights and exploration constant "
+                                                 "with SPSA over headless games")
+    parser.add_argument("output", help="Parameter file to write; engines load it with --config")
+    parser.add_argument("--iterations", type=int, default=200, help="SPSA iterations")
+    parser.add_argument("--games", type=int, default=32, help="Game pairs per iteration")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes, one game each")
+    parser.add_argument("--checkpoint", help="State file to resume from and to update after every iteration")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tiger", default="greedy", choices=TIGER_POLICIES, help="Tiger policy")
+    parser.add_argument("--search-iterations", type=int, default=300, help="MonteCarlo iterations per move")
+    parser.add_argument("--repetition-limit", type=int, default=3,
+                        help="Draw once a position occurs this often; 0 turns the rule off")
+    parser.add_argument("--a", type=float, default=4.0, help="SPSA step size gain")
+    parser.add_argument("--c", type=float, default=1.0, help="SPSA perturbation size, in units of the step scales")
+    args = parser.parse_args()
+    values = tune(args.output, args.iterations, args.games, args.workers, args.checkpoint, args.seed, args.tiger,
+                  {"iterations": args.search_iterations}, args.repetition_limit, SPSA(args.a, args.c))
+    for name, value in values.items():
+        print(f"{name}: {value:.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import argparse
+
+import numpy as np
+
+from position import NUMBER_OF_CELLS, occupancy
+from rules import tiger_can_move
+from constants import TIGER_WIN_GOAT_COUNT
+
+# Goat, tiger and empty masks, the goats remaining (scaled to 0..1) and the side to move
+NUMBER_OF_FEATURES = 3 * NUMBER_OF_CELLS + 2
+
+
+def position_features(tigers, goats, remaining_goat_number, goat_to_move):
+    """ Feature vector of one position """
+    goat_cells = occupancy(goats)
+    tiger_cells = occupancy(tigers)
+    empty_cells = [1 - goat - tiger for goat, tiger in zip(goat_cells, tiger_cells)]
+    return goat_cells + tiger_cells + empty_cells + [remaining_goat_number / 25, 1 if goat_to_move else 0]
+
+
+def record_features(records):
+    """ Feature matrix of a batch of self-play records (see selfplay.RECORD_DTYPE) """
+    return np.hstack([
+        records["goats"], records["tigers"], records["empty"],
+        records["goats_remaining"][:, None] / 25, records["goat_to_move"][:, None],
+    ]).astype(np.float32)
+
+
+class ValueNet:
+    # Small multi-layer perceptron predicting the game outcome for the goats, in -1..1.
+    # Without hidden layers it is a linear model. Inference is batched: many positions are scored
+    # with one matrix multiply per layer.
+    def __init__(self, layers):
+        # layers: list of (weights, bias) pairs; tanh between and after the layers
+        self.layers = layers
+
+    @classmethod
+    def create(cls, hidden_sizes=(32,), seed=0):
+        """ Randomly initialised network """
+        rng = np.random.default_rng(seed)
+        sizes = [NUMBER_OF_FEATURES, *hidden_sizes, 1]
+        return cls([(rng.normal(0, 1 / np.sqrt(n_in), (n_in, n_out)).astype(np.float32),
+                     np.zeros(n_out, dtype=np.float32)) for n_in, n_out in zip(sizes, sizes[1:])])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls([(data[f"w{i}"], data[f"b{i}"]) for i in range(len(data.files) // 2)])
+
+    def save(self, path):
+        arrays = {}
+        for i, (weights, bias) in enumerate(self.layers):
+            arrays[f"w{i}"] = weights
+            arrays[f"b{i}"] = bias
+        np.savez(path, **arrays)
+
+    def forward(self, features):
+        """ Activations of every layer, the last one being the predicted values """
+        activations = [features]
+        for weights, bias in self.layers:
+            activations.append(np.tanh(activations[-1] @ weights + bias))
+        return activations
+
+    def predict(self, features):
+        """ Predicted outcomes of a (positions x features) matrix """
+        return self.forward(features)[-1][:, 0]
+
+    def evaluate_states(self, states):
+        """ Values of many monte_carlo.State leaves at once; finished games get their exact value """
+        values = self.predict(np.array([position_features(state.tigers, state.goats, state.remaining_goat_number,
+                                                          state.goat_turn) for state in states], dtype=np.float32))
+        for i, state in enumerate(states):
+            if state.remaining_goat_number <= TIGER_WIN_GOAT_COUNT:
+                values[i] = -1
+            elif not any(tiger_can_move(tiger, state.tigers, state.goats) for tiger in state.tigers):
+                values[i] = 1
+        return values
+
+
+def train(shards, hidden_sizes=(32,), epochs=5, batch_size=256, learning_rate=1e-3, seed=0):
+    """ Fit a value network to the outcomes of memory-mapped self-play shards with Adam.
+    Only one mini-batch is in memory at a time. """
+    rng = np.random.default_rng(seed)
+    net = ValueNet.create(hidden_sizes, seed)
+    params = [array for layer in net.layers for array in layer]
+    first_moments = [np.zeros_like(p) for p in params]
+    second_moments = [np.zeros_like(p) for p in params]
+    step = 0
+    for epoch in range(epochs):
+        total_loss, total_count = 0.0, 0
+        for shard in rng.permutation(len(shards)):
+            records = shards[shard]
+            order = rng.permutation(len(records))
+            for start in range(0, len(order), batch_size):
+                batch = records[np.sort(order[start:start + batch_size])]
+                targets = batch["outcome"].astype(np.float32)
+                activations = net.forward(record_features(batch))
+                error = activations[-1][:, 0] - targets
+                total_loss += float(np.sum(error ** 2))
+                total_count += len(error)
+
+                # Backpropagate the mean squared error through the tanh layers
+                delta = (2 * error / len(error))[:, None] * (1 - activations[-1] ** 2)
+                gradients = []
+                for i in range(len(net.layers) - 1, -1, -1):
+                    weights, _ = net.layers[i]
+                    gradients = [activations[i].T @ delta, delta.sum(axis=0)] + gradients
+                    if i:
+                        delta = (delta @ weights.T) * (1 - activations[i] ** 2)
+
+                step += 1
+                for p, g, m, v in zip(params, gradients, first_moments, second_moments):
+                    m *= 0.9
+                    m += 0.1 * g
+                    v *= 0.999
+                    v += 0.001 * g * g
+                    p -= learning_rate * (m / (1 - 0.9 ** step)) / (np.sqrt(v / (1 - 0.999 ** step)) + 1e-8)
+        print(f"epoch {epoch + 1}: mse {total_loss / max(total_count, 1):.4f}")
+    return net
+
+
+def main():
+    from selfplay import open_shards
+    parser = argparse.ArgumentParser(description="Train a value network on self-play shards")
+    parser.add_argument("shards", help="Directory of self-play shards")
+    parser.add_argument("output", help="Output weights file (.npz)")
+    parser.add_argument("--hidden", type=int, nargs="*", default=[32], help="Hidden layer sizes; none for linear")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--learning-rate", type=float, default=1e-3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    net = train(open_shards(args.shards), args.hidden, args.epochs, args.batch_size, args.learning_rate, args.seed)
+    net.save(args.output)
+
+
+if __name__ == '__main__':
+    main()